@@ -0,0 +1,91 @@
+import heapq
+import os
+import time
+
+from reasons import reason_codes
+from scoring import FEATURE_COLS, flag_agreement
+
+# Rows parsed and scored at a time in streaming mode. Peak memory follows this, not the file size.
+CHUNK_ROWS = int(os.getenv("BATCH_CHUNK_ROWS", "50000"))
+TOP_K = 100
+
+
+class TopK:
+    """Bounded min-heap that keeps the K highest-scoring rows seen so far.
+
+    Ties go to the row that appeared first in the file.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []
+
+    def push(self, score, position, record):
+        item = (score, -position, record)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, item)
+        elif item[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, item)
+
+    def threshold(self):
+        """Lowest score still in the heap (None until the heap is full)."""
+        return self._heap[0][0] if len(self._heap) >= self.k else None
+
+    def results(self):
+        return [record for _, _, record in sorted(self._heap, key=lambda x: x[:2], reverse=True)]
+
+
+def missing_columns(columns):
+    return [col for col in FEATURE_COLS if col not in columns]
+
+
+def scan_csv_stream(fileobj, scorer, chunk_rows=CHUNK_ROWS, top_k=TOP_K, on_chunk=None, velocity=None):
+    """Score a CSV file object chunk by chunk with both models of a scoring.Scorer.
+
+    Returns the same (stats, top_risky_transactions) pair as the in-memory
+    /upload-batch path. Raises ValueError for unreadable files or missing columns.
+    `on_chunk(stats, chunk)` is called after every chunk with the running counts
+    and the scored chunk. With a velocity.VelocityStore, every chunk gets the velocity
+    columns (clocked by its timestamp / step column if it has one) and the store is
+    updated as rows pass.
+    """
+    import pandas as pd
+    stats = {"total_scanned": 0, "rf_flags": 0, "xgb_flags": 0, "both_agreed": 0}
+    top = TopK(top_k)
+
+    try:
+        reader = pd.read_csv(fileobj, chunksize=chunk_rows)
+        for chunk in reader:
+            missing = missing_columns(chunk.columns)
+            if missing:
+                raise ValueError(f"CSV must contain columns: {FEATURE_COLS}")
+
+            if velocity is not None:
+                velocity.observe_frame(chunk, time.time())
+            scorer.score_frame(chunk)
+            chunk['reason'] = reason_codes(chunk)
+            offset = stats["total_scanned"]
+
+            # 1. Running counts
+            rf_flags, xgb_flags, both_agreed = flag_agreement(chunk['RF_Prediction'], chunk['XGB_Prediction'])
+            stats["total_scanned"] += len(chunk)
+            stats["rf_flags"] += rf_flags
+            stats["xgb_flags"] += xgb_flags
+            stats["both_agreed"] += both_agreed
+
+            # 2. Only the chunk's own top-K can make it into the global top-K
+            candidates = chunk.nlargest(top_k, 'XGB_Risk_Score', keep='first')
+            floor = top.threshold()
+            if floor is not None:
+                candidates = candidates[candidates['XGB_Risk_Score'] >= floor]
+            for position, record in zip(candidates.index, candidates.to_dict(orient="records")):
+                top.push(record['XGB_Risk_Score'], offset + (position - chunk.index[0]), record)
+
+            if on_chunk is not None:
+                on_chunk(dict(stats), chunk)
+    except pd.errors.ParserError as e:
+        raise ValueError("Invalid CSV file") from e
+    except pd.errors.EmptyDataError as e:
+        raise ValueError("Invalid CSV file") from e
+
+    return stats, top.results()
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from metrics import Histogram
+
+# How long the batcher waits for more requests after the first one arrives,
+# and the most rows it will put in a single predict_proba call.
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "2"))
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "64"))
+
+
+class MicroBatcher:
+    """Collects concurrent /predict rows and scores them as one matrix per model.
+
+    `score_fn(model_type, X)` gets a 2D float array and must return the fraud
+    probability for every row. It runs on `executor` (None = default threadpool)
+    so the event loop stays free while the forest is being walked.
+    """
+
+    def __init__(self, score_fn, window_ms=BATCH_WINDOW_MS, max_rows=BATCH_MAX_ROWS, executor=None):
+        self.score_fn = score_fn
+        self.executor = executor
+        self.window = window_ms / 1000.0
+        self.max_rows = max_rows
+        self.queue = None
+        self._worker = None
+
+        # Tuning data: how full the batches are and how long rows sit in the queue (seconds)
+        self.batch_size_hist = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.queue_wait_hist = Histogram([0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1])
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self.queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, model_type, row):
+        """Queue one feature row and wait for its fraud probability."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((model_type, row, future, time.perf_counter()))
+        return await future
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # 1. Block until the first request shows up
+            batch = [await self.queue.get()]
+
+            # 2. Keep collecting until the window closes or the batch is full
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_rows:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # 3. Score it (don't let one bad batch kill the worker)
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _flush(self, batch):
+        now = time.perf_counter()
+        for _, _, _, enqueued in batch:
+            self.queue_wait_hist.observe(now - enqueued)
+        self.batch_size_hist.observe(len(batch))
+
+        # One predict_proba call per model, not per request
+        groups = {}
+        for item in batch:
+            groups.setdefault(item[0], []).append(item)
+
+        loop = asyncio.get_running_loop()
+        for model_type, items in groups.items():
+            X = np.array([row for _, row, _, _ in items], dtype=np.float64)
+            try:
+                probs = await loop.run_in_executor(self.executor, self.score_fn, model_type, X)
+            except Exception as e:
+                for _, _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, _, future, _), prob in zip(items, probs):
+                if not future.done():
+                    future.set_result(float(prob))
+
+    def stats(self):
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_rows": self.max_rows,
+            "batch_size": self.batch_size_hist.snapshot(),
+            "queue_wait_seconds": self.queue_wait_hist.snapshot(),
+        }
@@ -0,0 +1,67 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from history_store import init_history_tables, record_scan, dashboard_stats
+
+# Dashboard benchmark: a throwaway DB with BENCH_ROWS history rows (default 1,000,000),
+# comparing the old full-table aggregates against the rollup read.
+ROWS = int(os.getenv("BENCH_ROWS", "1000000"))
+REPEATS = 20
+
+
+def old_dashboard(c):
+    # The queries /dashboard-stats used to run on every refresh
+    c.execute("SELECT COUNT(*) FROM history")
+    c.fetchone()
+    c.execute("SELECT SUM(total_scanned) FROM history")
+    c.fetchone()
+    c.execute("SELECT SUM(fraud_found_xgb) FROM history")
+    c.fetchone()
+    c.execute("SELECT scan_date, fraud_found_xgb, fraud_found_rf FROM history ORDER BY id DESC LIMIT 7")
+    c.fetchall()
+
+
+def timed(fn, c):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(c)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2] * 1000
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+    c = conn.cursor()
+    init_history_tables(c)
+
+    print(f"Inserting {ROWS} history rows through record_scan...")
+    rng = random.Random(0)
+    start_day = datetime(2024, 1, 1)
+    start = time.perf_counter()
+    for i in range(ROWS):
+        day = start_day + timedelta(seconds=i * 60)
+        total = rng.randint(10, 5000)
+        record_scan(c, day.strftime("%Y-%m-%d %H:%M:%S"), f"scan_{i}.csv", total,
+                    rng.randint(0, total // 10), rng.randint(0, total // 10))
+    conn.commit()
+    insert_us = (time.perf_counter() - start) / ROWS * 1e6
+
+    old_ms = timed(old_dashboard, c)
+    new_ms = timed(dashboard_stats, c)
+    conn.close()
+
+results = {
+    "history_rows": ROWS,
+    "record_scan_us_per_insert": round(insert_us, 2),
+    "old_dashboard_ms": round(old_ms, 3),
+    "rollup_dashboard_ms": round(new_ms, 3),
+    "speedup": round(old_ms / new_ms, 1) if new_ms else None,
+}
+print(json.dumps(results, indent=2))
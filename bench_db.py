@@ -0,0 +1,99 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import db
+from history_store import init_history_tables, record_scan, dashboard_stats, history_page
+
+# Concurrency benchmark for fraud_history.db: BENCH_WRITERS threads saving scans and
+# BENCH_READERS threads refreshing the dashboard / first history page, for BENCH_SECONDS.
+# "legacy" is the old connect-per-call, rollback-journal pattern; "pooled" is db.py.
+WRITERS = int(os.getenv("BENCH_WRITERS", "4"))
+READERS = int(os.getenv("BENCH_READERS", "8"))
+SECONDS = float(os.getenv("BENCH_SECONDS", "5"))
+
+
+def legacy_write(path):
+    conn = sqlite3.connect(path)
+    record_scan(conn.cursor(), "2025-12-18 12:00:00", "bench.csv", 100, 5, 3)
+    conn.commit()
+    conn.close()
+
+
+def legacy_read(path):
+    conn = sqlite3.connect(path)
+    dashboard_stats(conn.cursor())
+    history_page(conn.cursor(), limit=50)
+    conn.close()
+
+
+def run(mode, path):
+    pool = db.ConnectionPool(path, size=WRITERS + READERS)
+    if mode == "pooled":
+        def write():
+            pool.write(record_scan, "2025-12-18 12:00:00", "bench.csv", 100, 5, 3).result()
+
+        def read():
+            with pool.connection() as conn:
+                dashboard_stats(conn.cursor())
+                history_page(conn.cursor(), limit=50)
+    else:
+        def write():
+            legacy_write(path)
+
+        def read():
+            legacy_read(path)
+
+    stats = {"write": [], "read": [], "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + SECONDS
+
+    def worker(kind, fn):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                fn()
+            except sqlite3.OperationalError:  # "database is locked"
+                with lock:
+                    stats["errors"] += 1
+                continue
+            with lock:
+                stats[kind].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=("write", write)) for _ in range(WRITERS)]
+    threads += [threading.Thread(target=worker, args=("read", read)) for _ in range(READERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    pool.close()
+
+    def summary(times):
+        times = sorted(times)
+        if not times:
+            return {"ops_per_sec": 0.0, "p50_ms": None, "p99_ms": None}
+        return {
+            "ops_per_sec": round(len(times) / SECONDS, 1),
+            "p50_ms": round(times[len(times) // 2] * 1000, 3),
+            "p99_ms": round(times[min(len(times) - 1, int(len(times) * 0.99))] * 1000, 3),
+        }
+
+    return {"writes": summary(stats["write"]), "reads": summary(stats["read"]), "locked_errors": stats["errors"]}
+
+
+results = {"writers": WRITERS, "readers": READERS, "seconds": SECONDS}
+for mode in ("legacy", "pooled"):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        conn = sqlite3.connect(path)
+        init_history_tables(conn.cursor())
+        conn.commit()
+        conn.close()
+        results[mode] = run(mode, path)
+        print(f"{mode:7s} writes {results[mode]['writes']['ops_per_sec']:>9}/s  "
+              f"reads {results[mode]['reads']['ops_per_sec']:>9}/s  locked errors {results[mode]['locked_errors']}")
+
+print(json.dumps(results, indent=2))
@@ -0,0 +1,194 @@
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import data_prep
+from models import MODEL_PATHS, ModelStore
+from scoring import DEFAULT_THRESHOLDS, FEATURE_COLS, MODEL_TYPES, Scorer
+from tree_engine import parity_sample
+
+# Benchmark + evaluation harness for the stored models.
+# For each model, through the same Scorer / ModelStore the API uses:
+#   latency     single-row and batched predict_proba percentiles, rows/sec per batch size
+#   shap        exact and fast attribution cost per row
+#   memory      peak traced allocations while scoring the largest batch, process peak RSS
+#   quality     metrics on the held-out rows of the training split (data_prep.py), at the
+#               current RF_THRESHOLD / XGB_THRESHOLD
+# Prints JSON (and writes it to BENCH_OUT). With BENCH_BASELINE=<previous run's JSON> it
+# exits 1 if a model got slower than BENCH_MAX_SLOWDOWN x baseline or lost more than
+# BENCH_MAX_QUALITY_DROP of precision / recall / PR-AUC.
+BATCH_SIZES = [int(n) for n in os.getenv("BENCH_BATCH_SIZES", "1,10,100,1000,10000").split(",")]
+SINGLE_CALLS = int(os.getenv("BENCH_SINGLE_CALLS", "500"))
+SHAP_ROWS = int(os.getenv("BENCH_SHAP_ROWS", "200"))
+MAX_SLOWDOWN = float(os.getenv("BENCH_MAX_SLOWDOWN", "1.25"))
+MAX_QUALITY_DROP = float(os.getenv("BENCH_MAX_QUALITY_DROP", "0.01"))
+
+
+def percentiles(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(ms, p)), 4) for p in (50, 90, 99)}
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def load_rows():
+    """Held-out split if the training data is there; otherwise synthetic rows (no quality metrics)."""
+    if os.path.exists(data_prep.RAW_CSV):
+        data = data_prep.load()
+    elif os.path.exists(os.path.join(data_prep.DATA_CACHE_DIR, "meta.json")):
+        data = data_prep.PreparedData()  # a cache built elsewhere, without the CSV
+    else:
+        data = None
+    if data is not None:
+        _, test_idx = data.split()
+        return data.frame(test_idx), np.asarray(data.y[test_idx])
+    import pandas as pd
+    return pd.DataFrame(parity_sample(max(BATCH_SIZES) * 2), columns=FEATURE_COLS), None
+
+
+def bench_latency(scorer, model_type, X):
+    rng = np.random.default_rng(0)
+    rows = X.iloc[rng.integers(0, len(X), SINGLE_CALLS)]
+    single = []
+    for i in range(len(rows)):
+        row = rows.iloc[i:i + 1]
+        start = time.perf_counter()
+        scorer.probabilities(model_type, row)
+        single.append(time.perf_counter() - start)
+
+    batched = {}
+    for size in BATCH_SIZES:
+        batch = X.iloc[:size] if size <= len(X) else X.sample(size, replace=True, random_state=0)
+        scorer.probabilities(model_type, batch)  # warm-up
+        runs = max(3, min(50, 20000 // size))
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            scorer.probabilities(model_type, batch)
+            times.append(time.perf_counter() - start)
+        batched[str(size)] = {**percentiles(times), "rows_per_sec": round(size / float(np.median(times)), 1)}
+    return {"single_row": percentiles(single), "batched": batched}
+
+
+def bench_shap(store, model_type, X):
+    explainer = store.explainer(model_type)
+    sample = X.iloc[:SHAP_ROWS]
+    costs = {}
+    for mode in ("exact", "fast"):
+        explainer.explain(sample.iloc[:5], None, mode)  # warm-up
+        start = time.perf_counter()
+        explainer.explain(sample, None, mode)
+        costs[f"{mode}_ms_per_row"] = round((time.perf_counter() - start) / len(sample) * 1000, 4)
+    return costs
+
+
+def bench_memory(scorer, model_type, X):
+    batch = X.iloc[:max(BATCH_SIZES)]
+    tracemalloc.start()
+    scorer.probabilities(model_type, batch)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"batch_rows": len(batch), "traced_peak_mb": round(peak / 2**20, 2), "process_peak_rss_mb": peak_rss_mb()}
+
+
+def evaluate(scorer, model_type, X, y):
+    from sklearn.metrics import (average_precision_score, confusion_matrix, f1_score, precision_score,
+                                 recall_score, roc_auc_score)
+    preds, probs = scorer.score(model_type, X)
+    tn, fp, fn, tp = confusion_matrix(y, preds, labels=[0, 1]).ravel()
+    return {
+        "rows": int(len(y)),
+        "threshold": scorer.thresholds[model_type],
+        "accuracy": round(float((preds == y).mean()), 6),
+        "precision": round(float(precision_score(y, preds, zero_division=0)), 6),
+        "recall": round(float(recall_score(y, preds, zero_division=0)), 6),
+        "f1": round(float(f1_score(y, preds, zero_division=0)), 6),
+        "roc_auc": round(float(roc_auc_score(y, probs)), 6) if 0 < y.sum() < len(y) else None,
+        "pr_auc": round(float(average_precision_score(y, probs)), 6) if y.sum() else None,
+        "confusion": {"tn": int(tn), "fp": int(fp), "fn": int(fn), "tp": int(tp)},
+    }
+
+
+def regressions(current, baseline):
+    """Human-readable list of what got worse than the baseline run."""
+    found = []
+    for model_type, result in current["models"].items():
+        base = baseline.get("models", {}).get(model_type)
+        if not base:
+            continue
+        for size, stats in result["latency"]["batched"].items():
+            old = base["latency"]["batched"].get(size)
+            if old and stats["p50_ms"] > old["p50_ms"] * MAX_SLOWDOWN:
+                found.append(f"{model_type} batch {size}: p50 {old['p50_ms']} -> {stats['p50_ms']} ms")
+        old, new = base["latency"]["single_row"], result["latency"]["single_row"]
+        if new["p50_ms"] > old["p50_ms"] * MAX_SLOWDOWN:
+            found.append(f"{model_type} single row: p50 {old['p50_ms']} -> {new['p50_ms']} ms")
+        if result.get("quality") and base.get("quality"):
+            for metric in ("precision", "recall", "pr_auc"):
+                old_v, new_v = base["quality"].get(metric), result["quality"].get(metric)
+                if old_v is not None and new_v is not None and new_v < old_v - MAX_QUALITY_DROP:
+                    found.append(f"{model_type} {metric}: {old_v} -> {new_v}")
+    return found
+
+
+def main():
+    store = ModelStore()
+    scorer = Scorer(store.scorers())
+    X, y = load_rows()
+    print(f"Benchmarking on {len(X)} rows ({'held-out split' if y is not None else 'synthetic'})...",
+          file=sys.stderr)
+
+    results = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "backend": store.backend,
+        "python": platform.python_version(),
+        "thresholds": dict(DEFAULT_THRESHOLDS),
+        "models": {},
+    }
+    for model_type in MODEL_TYPES:
+        st = os.stat(MODEL_PATHS[model_type])
+        start = time.perf_counter()
+        store.scoring_model(model_type)
+        result = {
+            "file": {"path": MODEL_PATHS[model_type], "size": st.st_size, "mtime": st.st_mtime},
+            "load_seconds": round(time.perf_counter() - start, 4),
+            "latency": bench_latency(scorer, model_type, X),
+            "memory": bench_memory(scorer, model_type, X),
+            "shap": bench_shap(store, model_type, X),
+            "quality": evaluate(scorer, model_type, X, y) if y is not None else None,
+        }
+        results["models"][model_type] = result
+        print(f"{model_type}: single-row p50 {result['latency']['single_row']['p50_ms']} ms, "
+              f"{result['latency']['batched'][str(max(BATCH_SIZES))]['rows_per_sec']} rows/s at {max(BATCH_SIZES)}",
+              file=sys.stderr)
+    results["process_peak_rss_mb"] = peak_rss_mb()
+
+    failed = []
+    baseline_path = os.getenv("BENCH_BASELINE")
+    if baseline_path:
+        with open(baseline_path) as f:
+            failed = regressions(results, json.load(f))
+        results["regressions"] = failed
+
+    out = json.dumps(results, indent=2)
+    print(out)
+    if os.getenv("BENCH_OUT"):
+        with open(os.getenv("BENCH_OUT"), "w") as f:
+            f.write(out)
+    for line in failed:
+        print(f"REGRESSION: {line}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
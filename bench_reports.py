@@ -0,0 +1,65 @@
+import json
+import os
+import random
+import tempfile
+import time
+
+import reports
+
+# Reports/sec benchmark for reports.py: BENCH_REPORTS full-size reports (20 confirmed +
+# 20 false-alarm rows each), rendered
+#   disk       - render, then write the PDF to a file (what /save-report used to do)
+#   memory     - render straight into an in-memory buffer
+#   bulk       - reports.render_many across REPORT_WORKERS processes
+COUNT = int(os.getenv("BENCH_REPORTS", "200"))
+
+
+def fake_row(rng):
+    amount = rng.uniform(1000, 300000)
+    old = rng.uniform(0, 400000)
+    return {
+        "amount": amount, "oldbalanceOrg": old, "newbalanceOrig": max(old - amount, 0.0),
+        "oldbalanceDest": rng.uniform(0, 100000), "newbalanceDest": rng.uniform(0, 400000),
+        "RF_Risk_Score": rng.random(), "XGB_Risk_Score": rng.random(),
+    }
+
+
+def fake_report(rng, i):
+    return {
+        "filename": f"bench_{i}.csv", "total": 5000, "xgb_fraud": 40, "rf_fraud": 30,
+        "confirmed_frauds": [fake_row(rng) for _ in range(reports.MAX_TABLE_ROWS)],
+        "false_alarms": [fake_row(rng) for _ in range(reports.MAX_TABLE_ROWS)],
+    }
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    return {"seconds": round(seconds, 3), "reports_per_sec": round(COUNT / seconds, 1)}
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    payloads = [fake_report(rng, i) for i in range(COUNT)]
+    thresholds = {"RF": 0.5, "XGB": 0.5}
+    results = {"reports": COUNT, "workers": reports.REPORT_WORKERS}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def to_disk():
+            for i, report in enumerate(payloads):
+                with open(os.path.join(tmp, f"r{i}.pdf"), "wb") as f:
+                    f.write(reports.render_report(report, f"bench_{i}", thresholds))
+
+        results["disk"] = timed(to_disk)
+
+    results["memory"] = timed(lambda: [reports.render_report(r, f"bench_{i}", thresholds)
+                                       for i, r in enumerate(payloads)])
+
+    reports.render_many(payloads[:reports.REPORT_WORKERS * 2], thresholds)  # start the worker processes
+    results["bulk"] = timed(lambda: reports.render_many(payloads, thresholds))
+    reports.shutdown()
+
+    for mode in ("disk", "memory", "bulk"):
+        print(f"{mode:7s} {results[mode]['reports_per_sec']:>8} reports/s")
+    print(json.dumps(results, indent=2))
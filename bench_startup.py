@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+
+# Startup benchmark: cold-starts the API in a fresh interpreter a few times per mode and
+# reports how long `import main` takes and how long until the first /predict answers.
+RUNS = int(os.getenv("BENCH_RUNS", "3"))
+
+PROBE = r'''
+import time, json, warnings
+warnings.filterwarnings("ignore")
+start = time.perf_counter()
+import main
+imported = time.perf_counter() - start
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    tx = {"amount": 181.0, "oldbalanceOrg": 181.0, "newbalanceOrig": 0.0, "oldbalanceDest": 0.0, "newbalanceDest": 0.0}
+    client.post("/predict?model_type=XGB", json=tx)
+    first_predict = time.perf_counter() - start
+print(json.dumps({"import_seconds": imported, "first_predict_seconds": first_predict}))
+'''
+
+modes = {
+    "default": {"FAST_START": "0"},
+    "fast_start": {"FAST_START": "1"},  # implies MODEL_MMAP=1, so the compiled backend
+    "fast_start_sklearn": {"FAST_START": "1", "INFERENCE_BACKEND": "sklearn"},
+}
+
+results = {}
+for name, env in modes.items():
+    runs = []
+    for _ in range(RUNS):
+        out = subprocess.run([sys.executable, "-c", PROBE], env={**os.environ, **env},
+                             capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    results[name] = {
+        key: round(min(r[key] for r in runs), 3)  # best of N, least noisy for cold starts
+        for key in ("import_seconds", "first_predict_seconds")
+    }
+    print(f"{name:22s} import {results[name]['import_seconds']:.3f}s   first /predict {results[name]['first_predict_seconds']:.3f}s")
+
+print(json.dumps(results, indent=2))
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from scoring import FEATURE_COLS
+from tree_engine import parity_sample
+
+# Load generator for the streaming endpoint: sends BENCH_SECONDS of NDJSON transactions
+# (at BENCH_RATE records/sec, 0 = as fast as the server takes them) and reads the
+# results back at the same time. Reports sustained records/sec and end-to-end latency
+# (record sent -> its result received) percentiles.
+#   BENCH_URL unset   drive stream_scoring.StreamScorer in-process (no network)
+#   BENCH_URL=http://127.0.0.1:8000   POST /stream on a running server
+SECONDS = float(os.getenv("BENCH_SECONDS", "10"))
+RATE = float(os.getenv("BENCH_RATE", "0"))
+CHUNK_RECORDS = int(os.getenv("BENCH_CHUNK_RECORDS", "100"))  # records per write
+
+
+def make_lines(n=5000):
+    rows = parity_sample(n, seed=1)
+    return [(json.dumps({"id": i, **dict(zip(FEATURE_COLS, map(float, row)))}) + "\n").encode()
+            for i, row in enumerate(rows)]
+
+
+async def produce(lines, sent):
+    """Yield CHUNK_RECORDS-line chunks for SECONDS, paced to RATE; stamps send times by seq."""
+    start = time.perf_counter()
+    seq = 0
+    while time.perf_counter() - start < SECONDS:
+        chunk = []
+        for _ in range(CHUNK_RECORDS):
+            chunk.append(lines[seq % len(lines)])
+            seq += 1
+        now = time.perf_counter()
+        sent.extend([now] * len(chunk))
+        yield b"".join(chunk)
+        if RATE > 0:
+            delay = start + seq / RATE - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(0)
+
+
+def collect(text, sent, latencies, now):
+    for line in text.splitlines():
+        if line:
+            latencies.append(now - sent[json.loads(line)["seq"]])
+
+
+async def run_inprocess(lines):
+    from models import ModelStore
+    from scoring import Scorer
+    from stream_scoring import StreamScorer
+
+    store = ModelStore()
+    store.warm(explainers=False)
+    stream = StreamScorer(Scorer(store.scorers()), ThreadPoolExecutor(max_workers=2))
+    sent, latencies = [], []
+    start = time.perf_counter()
+    async for chunk in stream.results(_split(produce(lines, sent))):
+        collect(chunk, sent, latencies, time.perf_counter())
+    return latencies, time.perf_counter() - start, stream.stats()
+
+
+async def _split(chunks):
+    async for chunk in chunks:
+        for line in chunk.split(b"\n"):
+            if line:
+                yield line
+
+
+async def run_http(lines, url):
+    """Chunked POST /stream over a raw socket, so sending and receiving overlap."""
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    writer.write((f"POST /stream HTTP/1.1\r\nHost: {parts.netloc}\r\nContent-Type: application/x-ndjson\r\n"
+                  f"Transfer-Encoding: chunked\r\n\r\n").encode())
+    sent, latencies = [], []
+    start = time.perf_counter()
+
+    async def send():
+        async for chunk in produce(lines, sent):
+            writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            await writer.drain()  # blocks when the server stops reading: its backpressure
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def receive():
+        status = await reader.readline()
+        if b" 200 " not in status:
+            raise RuntimeError(f"/stream answered {status!r}")
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            key, _, value = line.decode().partition(":")
+            headers[key.strip().lower()] = value.strip()
+        pending = ""
+        while True:
+            if headers.get("transfer-encoding") == "chunked":
+                size = int((await reader.readline()).strip(), 16)
+                if size == 0:
+                    break
+                data = await reader.readexactly(size)
+                await reader.readexactly(2)
+            else:
+                data = await reader.read(65536)
+                if not data:
+                    break
+            pending += data.decode()
+            complete, _, pending = pending.rpartition("\n")
+            collect(complete, sent, latencies, time.perf_counter())
+
+    await asyncio.gather(send(), receive())
+    writer.close()
+    return latencies, time.perf_counter() - start, None
+
+
+if __name__ == "__main__":
+    lines = make_lines()
+    url = os.getenv("BENCH_URL")
+    latencies, seconds, stream_stats = asyncio.run(run_http(lines, url) if url else run_inprocess(lines))
+    ms = np.asarray(latencies) * 1000
+    results = {
+        "mode": url or "in-process",
+        "target_rate": RATE or "max",
+        "records": len(latencies),
+        "seconds": round(seconds, 3),
+        "records_per_sec": round(len(latencies) / seconds, 1),
+        "latency_ms": {f"p{p}": round(float(np.percentile(ms, p)), 3) for p in (50, 90, 99)},
+    }
+    if stream_stats:
+        results["stream"] = stream_stats
+    print(f"{results['records_per_sec']} records/s, p99 end-to-end {results['latency_ms']['p99']} ms")
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,67 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from velocity import VELOCITY_COLS, VelocityStore
+
+# Cost of the velocity feature store per transaction: one update + lookup (VelocityStore.observe,
+# what /predict does) and the batched path (observe_many, what uploads and data_prep use).
+# Synthetic stream: BENCH_TX transactions over BENCH_ACCOUNTS senders paying BENCH_DESTS
+# receivers, BENCH_TX_PER_SEC of simulated time apart. With more accounts than
+# VELOCITY_MAX_ACCOUNTS the LRU eviction path is exercised too.
+TX = int(os.getenv("BENCH_TX", "200000"))
+ACCOUNTS = int(os.getenv("BENCH_ACCOUNTS", "20000"))
+DESTS = int(os.getenv("BENCH_DESTS", "2000"))
+TX_PER_SEC = float(os.getenv("BENCH_TX_PER_SEC", "50"))
+
+
+def make_stream(n, seed=0):
+    rng = np.random.default_rng(seed)
+    # A few busy senders, a long tail of quiet ones
+    origs = [f"C{i}" for i in rng.zipf(1.3, n) % ACCOUNTS]
+    dests = [f"M{i}" for i in rng.integers(0, DESTS, n)]
+    times = np.arange(n) / TX_PER_SEC
+    amounts = rng.lognormal(9, 1.5, n)
+    return origs, dests, times, amounts
+
+
+def bench_single(origs, dests, times, amounts):
+    store = VelocityStore()
+    costs = np.empty(len(origs))
+    for i in range(len(origs)):
+        start = time.perf_counter()
+        store.observe(origs[i], dests[i], times[i], amounts[i])
+        costs[i] = time.perf_counter() - start
+    us = costs * 1e6
+    return store, {
+        "us_per_tx": round(float(us.mean()), 3),
+        **{f"p{p}_us": round(float(np.percentile(us, p)), 3) for p in (50, 99)},
+        "tx_per_sec": round(len(us) / costs.sum(), 1),
+    }
+
+
+def bench_batched(origs, dests, times, amounts):
+    store = VelocityStore()
+    start = time.perf_counter()
+    features = store.observe_many(origs, dests, times, amounts)
+    seconds = time.perf_counter() - start
+    return features, {"us_per_tx": round(seconds / len(origs) * 1e6, 3), "tx_per_sec": round(len(origs) / seconds, 1)}
+
+
+if __name__ == "__main__":
+    stream = make_stream(TX)
+    store, single = bench_single(*stream)
+    features, batched = bench_batched(*stream)
+    results = {
+        "transactions": TX,
+        "accounts": ACCOUNTS,
+        "simulated_hours": round(TX / TX_PER_SEC / 3600, 2),
+        "single": single,
+        "batched": batched,
+        "feature_means": {col: round(float(v), 3) for col, v in zip(VELOCITY_COLS, features.mean(axis=0))},
+        "store": store.stats(),
+    }
+    print(f"{single['us_per_tx']} us/tx single, {batched['us_per_tx']} us/tx batched")
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,43 @@
+import glob
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from scoring import FEATURE_COLS
+from tree_engine import PARITY_TOLERANCE, compile_model, max_parity_error, parity_sample
+
+# Parity check for the compiled inference backend (INFERENCE_BACKEND=compiled).
+# Fails (exit code 1) if any probability differs from the reference model by more than PARITY_TOLERANCE.
+
+samples = [parity_sample(20000)]
+for path in glob.glob("dataset/test_data*.csv"):
+    samples.append(pd.read_csv(path)[FEATURE_COLS].to_numpy(dtype=np.float64))
+X = np.vstack(samples)
+print(f"Checking {len(X)} rows...")
+
+failed = False
+for name, path in [("Random Forest", "fraud_model.joblib"), ("XGBoost", "fraud_model_xgboost.joblib")]:
+    model = joblib.load(path)
+    compiled = compile_model(model)
+    error = max_parity_error(model, compiled, X)
+    ok = error <= PARITY_TOLERANCE
+    failed |= not ok
+
+    df = pd.DataFrame(X[:1], columns=FEATURE_COLS)
+    start = time.perf_counter()
+    for _ in range(200):
+        model.predict_proba(df)
+    ref_ms = (time.perf_counter() - start) / 200 * 1000
+    start = time.perf_counter()
+    for _ in range(200):
+        compiled.predict_proba(df)
+    fast_ms = (time.perf_counter() - start) / 200 * 1000
+
+    print(f"\n{name}: {compiled.n_nodes} nodes, {len(compiled.roots)} trees")
+    print(f"Max |P(fraud) diff|: {error:.2e}  ->  {'PASS' if ok else 'FAIL'}")
+    print(f"Single-row latency: reference {ref_ms:.3f} ms, compiled {fast_ms:.3f} ms")
+
+sys.exit(1 if failed else 0)
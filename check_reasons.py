@@ -0,0 +1,59 @@
+import glob
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from reasons import DEFAULT_THRESHOLDS, generate_fraud_reason, load_thresholds, reason_codes
+from scoring import FEATURE_COLS
+
+# Parity check for the vectorized reason codes: reason_codes must give exactly what
+# generate_fraud_reason gives row by row. Fails (exit code 1) on any mismatch.
+
+rng = np.random.default_rng(0)
+n = 200000
+# Random rows, scaled so every rule (and the default) fires often
+random_rows = np.column_stack([
+    rng.choice([5000, 30000, 60000, 200000], n) * rng.random(n),
+    rng.choice([1000, 100000, 500000], n) * rng.random(n),
+    rng.choice([0, 1000, 500000], n) * rng.random(n),
+    rng.choice([0, 100000, 1000000], n) * rng.random(n),
+    rng.choice([0, 100000, 1000000], n) * rng.random(n),
+])
+# Values sitting exactly on every threshold (strict vs non-strict comparisons)
+edges = sorted({v + d for v in DEFAULT_THRESHOLDS.values() for d in (-1, 0, 1)} | {0.0})
+edge_rows = np.array([[a, o, nb, 0.0, d] for a in edges for o in (0.0, 100000.0, 250000.0)
+                      for nb in edges for d in (0.0, 150000.0, 150001.0)])
+frames = [pd.DataFrame(np.vstack([random_rows, edge_rows]), columns=FEATURE_COLS)]
+frames += [pd.read_csv(path)[FEATURE_COLS] for path in glob.glob("dataset/test_data*.csv")]
+df = pd.concat(frames, ignore_index=True)
+df.iloc[::997, 2] = np.nan  # NaNs compare False in both versions
+print(f"Checking {len(df)} rows...")
+
+failed = False
+for label, thresholds in [("default", None), ("custom", load_thresholds({"drain_min_amount": 75000,
+                                                                          "recipient_min_change": 50000}))]:
+    records = df.to_dict(orient="records")
+    start = time.perf_counter()
+    expected = np.array([generate_fraud_reason(row, thresholds) for row in records], dtype=object)
+    row_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    got = reason_codes(df, thresholds)
+    vec_ms = (time.perf_counter() - start) * 1000
+
+    mismatches = int((expected != got).sum())
+    failed |= mismatches > 0
+    counts = pd.Series(got).value_counts().to_dict()
+    print(f"\n{label} thresholds: {mismatches} mismatches  ->  {'PASS' if not mismatches else 'FAIL'}")
+    print(f"Reasons: {counts}")
+    print(f"Per-row {row_ms:.1f} ms, vectorized {vec_ms:.1f} ms")
+
+# Missing columns count as 0, like row.get(col, 0)
+partial = {"amount": np.array([60000.0, 20000.0]), "newbalanceOrig": np.array([0.0, 0.0])}
+expected = [generate_fraud_reason({k: v[i] for k, v in partial.items()}) for i in range(2)]
+if list(reason_codes(partial)) != expected:
+    print("\nMissing-column rows: FAIL")
+    failed = True
+
+sys.exit(1 if failed else 0)
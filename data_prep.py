@@ -0,0 +1,184 @@
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from scoring import FEATURE_COLS
+from velocity import VELOCITY_COLS, VelocityStore, event_times
+
+# Shared data-prep stage for training and evaluation.
+# The PaySim CSV is parsed once, in chunks, into a column-pruned binary cache:
+#   dataset/cache/<column>.bin   raw little-endian column, memory-mapped on load
+#   dataset/cache/meta.json      row count, dtypes, source file size + mtime
+# Only TRANSFER / CASH_OUT rows are kept (the only types with fraud), filtered chunk
+# by chunk, so peak memory is one chunk of the CSV rather than the whole file.
+# Features are float32: both sklearn trees and XGBoost compare in float32 anyway.
+# Per-account velocity columns (velocity.py) are computed on the way through, in file
+# (= time) order with step * 1h as the clock (velocity.event_times, the same clock the API
+# uses for uploads with a step column), so each row only sees earlier transactions.
+RAW_CSV = os.getenv("TRAIN_CSV", "dataset/datasetkaggle.csv")
+DATA_CACHE_DIR = os.getenv("DATA_CACHE_DIR", "dataset/cache")
+PREP_CHUNK_ROWS = int(os.getenv("PREP_CHUNK_ROWS", "1000000"))
+
+TYPES = ("TRANSFER", "CASH_OUT")
+COLUMNS = {
+    **{col: "<f4" for col in FEATURE_COLS},
+    **{col: "<f4" for col in VELOCITY_COLS},
+    "type": "i1",     # index into TYPES
+    "isFraud": "i1",
+}
+TEST_SIZE = 0.2
+SEED = 42
+
+
+def _source_version(csv_path):
+    st = os.stat(csv_path)
+    return {"path": os.path.abspath(csv_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def is_fresh(csv_path=RAW_CSV, cache_dir=DATA_CACHE_DIR):
+    try:
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta.get("source") == _source_version(csv_path) and meta.get("columns") == COLUMNS
+
+
+def build_cache(csv_path=RAW_CSV, cache_dir=DATA_CACHE_DIR, chunk_rows=PREP_CHUNK_ROWS):
+    """Convert the CSV into the binary cache. Returns the cache's meta dict."""
+    import pandas as pd
+    start = time.perf_counter()
+    os.makedirs(cache_dir, exist_ok=True)
+    # Written under .tmp names and renamed at the end, so a half-built cache is never loaded
+    paths = {col: os.path.join(cache_dir, f"{col}.bin") for col in COLUMNS}
+    files = {col: open(f"{path}.tmp", "wb") for col, path in paths.items()}
+    rows = frauds = raw_rows = 0
+    velocity = VelocityStore()
+    try:
+        reader = pd.read_csv(csv_path, usecols=["step", "type", "nameOrig", "nameDest", *FEATURE_COLS, "isFraud"],
+                             chunksize=chunk_rows,
+                             dtype={**{col: np.float32 for col in FEATURE_COLS}, "isFraud": np.int8})
+        for chunk in reader:
+            raw_rows += len(chunk)
+            chunk = chunk[chunk["type"].isin(TYPES)]
+            codes = np.where(chunk["type"].to_numpy() == TYPES[0], 0, 1).astype(np.int8)
+            for col in FEATURE_COLS:
+                files[col].write(np.ascontiguousarray(chunk[col].to_numpy(), dtype=COLUMNS[col]).tobytes())
+            history = velocity.observe_many(chunk["nameOrig"].tolist(), chunk["nameDest"].tolist(),
+                                            event_times(chunk, 0.0), chunk["amount"].to_numpy())
+            for i, col in enumerate(VELOCITY_COLS):
+                files[col].write(np.ascontiguousarray(history[:, i], dtype=COLUMNS[col]).tobytes())
+            files["type"].write(codes.tobytes())
+            files["isFraud"].write(np.ascontiguousarray(chunk["isFraud"].to_numpy(), dtype="i1").tobytes())
+            rows += len(chunk)
+            frauds += int(chunk["isFraud"].sum())
+    except BaseException:
+        for col, f in files.items():
+            f.close()
+            os.remove(f"{paths[col]}.tmp")
+        raise
+    for col, f in files.items():
+        f.close()
+        os.replace(f"{paths[col]}.tmp", paths[col])
+
+    meta = {
+        "rows": rows,
+        "frauds": frauds,
+        "raw_rows": raw_rows,
+        "columns": COLUMNS,
+        "types": list(TYPES),
+        "velocity": velocity.stats(),
+        "source": _source_version(csv_path),
+        "build_seconds": round(time.perf_counter() - start, 2),
+    }
+    with open(os.path.join(cache_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return meta
+
+
+class PreparedData:
+    """Memory-mapped view of the cache. Nothing is read until a column is touched."""
+
+    def __init__(self, cache_dir=DATA_CACHE_DIR):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.rows = self.meta["rows"]
+
+    def column(self, name):
+        if self.rows == 0:
+            return np.zeros(0, dtype=COLUMNS[name])
+        return np.memmap(os.path.join(self.cache_dir, f"{name}.bin"), dtype=COLUMNS[name], mode="r",
+                         shape=(self.rows,))
+
+    @property
+    def y(self):
+        return self.column("isFraud")
+
+    def features(self, idx=None, columns=FEATURE_COLS):
+        """float32 (n, len(columns)) feature matrix, optionally only the rows in `idx`."""
+        cols = [self.column(col) for col in columns]
+        if idx is None:
+            return np.column_stack(cols)
+        return np.column_stack([c[idx] for c in cols])
+
+    def frame(self, idx=None, columns=FEATURE_COLS):
+        import pandas as pd
+        return pd.DataFrame(self.features(idx, columns), columns=columns)
+
+    def split(self, test_size=TEST_SIZE, seed=SEED):
+        """(train_idx, test_idx): the stratified 80/20 split every trainer and evaluator uses.
+
+        Same rows, in the same order, as train_test_split(X, y, test_size=0.2,
+        random_state=42, stratify=y) on the filtered DataFrame, so retrained models
+        match the ones trained from the CSV.
+        """
+        from sklearn.model_selection import train_test_split
+        train_idx, test_idx = train_test_split(np.arange(self.rows), test_size=test_size,
+                                               random_state=seed, stratify=np.asarray(self.y))
+        return train_idx, test_idx
+
+
+def load(csv_path=RAW_CSV, cache_dir=DATA_CACHE_DIR):
+    """The prepared data, (re)building the cache first if the CSV changed."""
+    if not is_fresh(csv_path, cache_dir):
+        print(f"Preparing {csv_path} -> {cache_dir} (one-off)...")
+        meta = build_cache(csv_path, cache_dir)
+        print(f"Kept {meta['rows']} of {meta['raw_rows']} rows ({meta['frauds']} frauds) "
+              f"in {meta['build_seconds']}s")
+    return PreparedData(cache_dir)
+
+
+def xgb_batches(data, idx, batch_rows=PREP_CHUNK_ROWS, cache_prefix=None, columns=FEATURE_COLS):
+    """xgboost.DataIter over the rows in `idx`, one batch at a time.
+
+    Feed it to QuantileDMatrix (quantised in memory, ~1 byte per value) or, with a
+    cache_prefix, to ExtMemQuantileDMatrix (pages on disk) to train in a fixed RAM budget.
+    """
+    import xgboost as xgb
+
+    class Batches(xgb.DataIter):
+        def __init__(self):
+            self._pos = 0
+            super().__init__(cache_prefix=cache_prefix)
+
+        def next(self, input_data):
+            if self._pos >= len(idx):
+                return False
+            batch = idx[self._pos:self._pos + batch_rows]
+            input_data(data=data.features(batch, columns), label=np.asarray(data.y[batch]), feature_names=columns)
+            self._pos += batch_rows
+            return True
+
+        def reset(self):
+            self._pos = 0
+
+    return Batches()
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else RAW_CSV
+    print(json.dumps(build_cache(csv_path), indent=2))
@@ -0,0 +1,200 @@
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+DB_PATH = os.getenv("FRAUD_DB_PATH", "fraud_history.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "30"))
+# Group commit: up to this many queued writes share one transaction (one fsync)
+WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "64"))
+
+
+class ConnectionPool:
+    """Bounded pool of WAL-mode SQLite connections.
+
+    WAL lets readers keep reading while a write is in progress, so dashboard
+    refreshes no longer hit "database is locked" during report saves.
+    Connections run in autocommit mode; use `transaction()` for writes.
+    """
+
+    def __init__(self, path=DB_PATH, size=DB_POOL_SIZE, timeout=DB_BUSY_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._writer = None
+
+    def _connect(self):
+        # cached_statements keeps the compiled (prepared) form of every query we reuse
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                               check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # safe with WAL, skips an fsync per commit
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        # Pool exhausted: wait for someone to give a connection back
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError("No database connection available")
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection (autocommit; fine for reads and single statements)."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection inside BEGIN IMMEDIATE ... COMMIT (rolled back on error)."""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def write(self, fn, *args):
+        """Queue `fn(cursor, *args)` for the group-commit writer. Returns a Future with its result."""
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = BatchWriter(self)
+        return self._writer.submit(fn, *args)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.stop()
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self._created = 0
+
+
+class BatchWriter:
+    """Single writer thread that commits queued writes in batches.
+
+    Each write runs in its own SAVEPOINT, so a failing write is rolled back on
+    its own and the rest of the batch still commits.
+    """
+
+    def __init__(self, pool, batch_size=WRITE_BATCH_SIZE):
+        self.pool = pool
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args):
+        future = Future()
+        self._queue.put((fn, args, future))
+        return future
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._commit(batch)
+                    return
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        results = []
+        try:
+            with self.pool.transaction() as conn:
+                c = conn.cursor()
+                for fn, args, _ in batch:
+                    c.execute("SAVEPOINT write")
+                    try:
+                        results.append((fn(c, *args), None))
+                        c.execute("RELEASE write")
+                    except Exception as e:
+                        c.execute("ROLLBACK TO write")
+                        c.execute("RELEASE write")
+                        results.append((None, e))
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, _, future), (result, error) in zip(batch, results):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+def migrate(pool, migrations):
+    """Bring the schema up to date.
+
+    `migrations` is an ordered list of (version, fn(cursor)). The current version
+    is kept in PRAGMA user_version; each pending migration runs in its own
+    transaction together with the version bump.
+    """
+    with pool.connection() as conn:
+        current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, fn in migrations:
+        if version <= current:
+            continue
+        with pool.transaction() as conn:
+            # Re-check under the write lock in case another worker migrated first
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+            fn(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+    with pool.connection() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+_pool = None
+_pool_pid = None
+
+
+def get_pool():
+    """The process-wide pool (a fresh one in each worker process)."""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = ConnectionPool()
+        _pool_pid = os.getpid()
+    return _pool
@@ -0,0 +1,57 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Separate, bounded pools so a pile-up in one kind of work can't starve the others.
+# (e.g. 20 slow PDF renders no longer eat every threadpool slot /predict needs)
+# model_pool is interactive scoring + SHAP (/predict); batch_pool is whole-file and stream
+# scoring, so a few big uploads can hold all of theirs without /predict waiting behind them.
+MODEL_WORKERS = int(os.getenv("MODEL_WORKERS", "4"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "2"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+DB_WORKERS = int(os.getenv("DB_WORKERS", "4"))
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "8"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+
+model_pool = ThreadPoolExecutor(max_workers=MODEL_WORKERS, thread_name_prefix="model")
+batch_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+pdf_pool = ThreadPoolExecutor(max_workers=PDF_WORKERS, thread_name_prefix="pdf")
+db_pool = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+llm_pool = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="llm")
+
+_llm_limits = {}
+
+
+async def run_in(pool, fn, *args, **kwargs):
+    """Run a blocking call on one of the pools above and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+
+def _llm_limit():
+    # One semaphore per event loop (asyncio primitives are loop-bound)
+    loop = asyncio.get_running_loop()
+    if loop not in _llm_limits:
+        _llm_limits[loop] = asyncio.Semaphore(LLM_WORKERS)
+    return _llm_limits[loop]
+
+
+async def generate_text(llm, prompt, timeout=LLM_TIMEOUT):
+    """Ask Gemini without blocking the loop.
+
+    Uses the client's native async call when it has one and falls back to the
+    LLM pool otherwise. Concurrency is capped at LLM_WORKERS, and slow replies
+    are cut off after `timeout` seconds (raises asyncio.TimeoutError).
+    """
+    async with _llm_limit():
+        if hasattr(llm, "generate_content_async"):
+            response = await asyncio.wait_for(llm.generate_content_async(prompt), timeout)
+        else:
+            response = await asyncio.wait_for(run_in(llm_pool, llm.generate_content, prompt), timeout)
+        return response.text
+
+
+def shutdown():
+    for pool in (model_pool, batch_pool, pdf_pool, db_pool, llm_pool):
+        pool.shutdown(wait=False, cancel_futures=True)
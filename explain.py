@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from scoring import FEATURE_COLS, feature_frame, model_features
+
+# Per-request SHAP budget. In "auto" mode, a model whose exact TreeSHAP is expected
+# to take longer than this switches to the approximate (Saabas) attributions.
+SHAP_BUDGET_MS = float(os.getenv("SHAP_BUDGET_MS", "50"))
+SHAP_MODES = ("auto", "exact", "fast")
+
+
+def positive_class(shap_values):
+    """SHAP values for class 1 as an (n_rows, n_features) array.
+
+    XGBoost gives that directly; sklearn forests give one array per class
+    (a list in older shap, a trailing class axis in newer shap).
+    """
+    if isinstance(shap_values, list):
+        shap_values = shap_values[1]
+    shap_values = np.asarray(shap_values)
+    if shap_values.ndim == 3:
+        shap_values = shap_values[..., 1]
+    return shap_values
+
+
+def rank_factors(values, top_n=None, features=FEATURE_COLS):
+    """Turn one row of SHAP values into the frontend's [{feature, impact}] list, biggest first."""
+    order = np.argsort(-np.abs(values), kind="stable")
+    if top_n:
+        order = order[:top_n]
+    return [{"feature": features[i], "impact": float(values[i])} for i in order]
+
+
+class ModelExplainer:
+    """Cached TreeExplainer for one model, with a fast mode that respects a latency budget.
+
+    "exact" is full TreeSHAP, "fast" is the path-attribution approximation
+    (one pass down each tree, same cost as scoring), and "auto" picks exact
+    unless the measured exact cost per row says the batch would blow the budget.
+    """
+
+    def __init__(self, model, budget_ms=SHAP_BUDGET_MS):
+        import shap  # heavy (numba etc.), so only pulled in when an explainer is built
+        self.explainer = shap.TreeExplainer(model)
+        self.features = model_features(model)
+        self.budget = budget_ms / 1000.0
+        self.exact_cost = None  # moving average, seconds per row
+        self._lock = threading.Lock()
+
+    def choose_mode(self, n_rows, mode="auto"):
+        if mode != "auto":
+            return mode
+        if self.budget > 0 and self.exact_cost is not None and self.exact_cost * n_rows > self.budget:
+            return "fast"
+        return "exact"
+
+    def shap_values(self, X, mode="auto"):
+        """Class-1 SHAP values for X plus the mode that was actually used."""
+        mode = self.choose_mode(len(X), mode)
+        start = time.perf_counter()
+        values = positive_class(self.explainer.shap_values(X, approximate=(mode == "fast")))
+        if mode == "exact" and len(X):
+            per_row = (time.perf_counter() - start) / len(X)
+            with self._lock:
+                self.exact_cost = per_row if self.exact_cost is None else 0.8 * self.exact_cost + 0.2 * per_row
+        return values, mode
+
+    def explain(self, X, top_n=None, mode="auto"):
+        """Ranked factor lists for many rows in one vectorized call. Returns (factors, mode)."""
+        import pandas as pd
+        if not isinstance(X, pd.DataFrame):
+            X = feature_frame(X)
+        if len(X) == 0:
+            return [], self.choose_mode(0, mode)
+        values, used = self.shap_values(X[self.features], mode)
+        return [rank_factors(row, top_n, self.features) for row in values], used
+
+    def stats(self):
+        return {
+            "budget_ms": self.budget * 1000.0,
+            "exact_ms_per_row": self.exact_cost * 1000.0 if self.exact_cost is not None else None,
+        }
+
+
+def attach_explanations(explainer, records, top_n=None, mode="auto"):
+    """Add an "explanation" field to each result record (e.g. the top-100 risky rows).
+
+    Returns the SHAP mode that was used.
+    """
+    import pandas as pd
+    if not records:
+        return explainer.choose_mode(0, mode)
+    X = pd.DataFrame([[r[col] for col in explainer.features] for r in records], columns=explainer.features)
+    factors, used = explainer.explain(X, top_n, mode)
+    for record, row_factors in zip(records, factors):
+        record["explanation"] = row_factors
+    return used
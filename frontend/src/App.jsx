@@ -222,19 +222,24 @@ import { useEffect } from 'react'; // Add this to your top imports if missing!
 
 function HistoryView() {
   const [history, setHistory] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
 
+  // History is paged (newest first); "Load more" fetches the next page with the cursor
+  const fetchHistory = async (cursor = null) => {
+    try {
+      const params = cursor ? { cursor } : {};
+      const res = await axios.get('http://127.0.0.1:8000/history', { params });
+      setHistory((prev) => cursor ? [...prev, ...res.data.items] : res.data.items);
+      setNextCursor(res.data.next_cursor);
+    } catch (error) {
+      console.error("Failed to load history");
+    }
+    setLoading(false);
+  };
+
   // Fetch data when this page loads
   useEffect(() => {
-    const fetchHistory = async () => {
-      try {
-        const res = await axios.get('http://127.0.0.1:8000/history');
-        setHistory(res.data);
-      } catch (error) {
-        console.error("Failed to load history");
-      }
-      setLoading(false);
-    };
     fetchHistory();
   }, []);
 
@@ -276,6 +281,11 @@ function HistoryView() {
               )}
             </tbody>
           </table>
+          {nextCursor && (
+            <div style={{padding: '15px', textAlign: 'center'}}>
+              <button className="primary-btn" onClick={() => fetchHistory(nextCursor)}>Load more</button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -293,6 +303,7 @@ function DetectionView() {
   // FORM & STATE
   const [formData, setFormData] = useState({ amount: '', oldbalanceOrg: '', newbalanceOrig: '', oldbalanceDest: '', newbalanceDest: '' });
   const [singleResult, setSingleResult] = useState(null);
+  const [pendingAnalysis, setPendingAnalysis] = useState(null); // analysis_id still being written
   const [loading, setLoading] = useState(false);
   const [file, setFile] = useState(null);
   const [batchResults, setBatchResults] = useState(null);
@@ -303,13 +314,32 @@ function DetectionView() {
   // LOGIC
   const handleChange = (e) => setFormData({ ...formData, [e.target.name]: parseFloat(e.target.value) || 0 });
 
+  // The AI narrative is generated in the background; long-poll for it when still pending
+  const fetchAnalysis = async (data) => {
+    if (data.analysis_status !== 'pending') return data.ai_analysis;
+    try {
+      const res = await axios.get(`http://127.0.0.1:8000/analysis/${data.analysis_id}?wait=30`);
+      return res.data.ai_analysis || "Analysis pending.";
+    } catch (e) { return "Analysis not available."; }
+  };
+
   const handleSinglePredict = async () => {
     setLoading(true);
+    let data = null;
     try {
       const res = await axios.post('http://127.0.0.1:8000/predict?model_type=RF', formData);
-      setSingleResult(res.data);
+      data = res.data;
+      setSingleResult(data);
     } catch (e) { alert("Connection Error"); }
+    // The score is shown as soon as it arrives; the narrative fills in on its own
     setLoading(false);
+    if (data && data.analysis_status === 'pending') {
+      setPendingAnalysis(data.analysis_id);
+      const aiText = await fetchAnalysis(data);
+      // Only if this is still the result on screen
+      setSingleResult(prev => (prev === data ? { ...prev, ai_analysis: aiText } : prev));
+      setPendingAnalysis(prev => (prev === data.analysis_id ? null : prev));
+    }
   };
 
   const handleFileChange = (e) => {
@@ -325,9 +355,9 @@ function DetectionView() {
     fd.append("file", file);
     setLoading(true);
     try {
-      const res = await axios.post('http://127.0.0.1:8000/upload-batch', fd);
+      const res = await axios.post('http://127.0.0.1:8000/upload-batch?persist=true', fd);
       setBatchResults(res.data.top_risky_transactions);
-      setBatchStats(res.data.stats);
+      setBatchStats({ ...res.data.stats, scan_id: res.data.scan_id });
       setBatchTab('table');
     } catch (e) { alert("Upload Failed"); }
     setLoading(false);
@@ -340,7 +370,12 @@ function DetectionView() {
       const res = await axios.post(`http://127.0.0.1:8000/predict?model_type=${modelType}`, {
         amount: tx.amount, oldbalanceOrg: tx.oldbalanceOrg, newbalanceOrig: tx.newbalanceOrig, oldbalanceDest: tx.oldbalanceDest, newbalanceDest: tx.newbalanceDest
       });
-      setModalData({ loading: false, ai_text: res.data.ai_analysis, features: res.data.explanation, is_fraud: res.data.is_fraud, model: modelType, rowIndex: rowIndex, tx: tx });
+      const pending = res.data.analysis_status === 'pending';
+      setModalData({ loading: false, ai_text: res.data.ai_analysis, ai_pending: pending, features: res.data.explanation, is_fraud: res.data.is_fraud, model: modelType, rowIndex: rowIndex, tx: tx });
+      if (!pending) return;
+      // Scores and factors are already on screen; the narrative fills in when it's ready
+      const aiText = await fetchAnalysis(res.data);
+      setModalData(prev => (prev && prev.tx === tx ? { ...prev, ai_text: aiText, ai_pending: false } : prev));
     } catch (e) { setModalData({ loading: false, error: "Error", rowIndex: rowIndex, tx: tx }); }
   };
 
@@ -386,7 +421,8 @@ function DetectionView() {
         xgb_fraud: batchStats.xgb_flags, 
         rf_fraud: batchStats.rf_flags, 
         confirmed_frauds: confirmedFrauds.slice(0, 20),
-        false_alarms: falseAlarmTransactions.slice(0, 20)
+        false_alarms: falseAlarmTransactions.slice(0, 20),
+        scan_id: batchStats.scan_id
       }, { responseType: 'blob' });
       const url = window.URL.createObjectURL(new Blob([res.data]));
       const link = document.createElement('a');
@@ -516,7 +552,7 @@ function DetectionView() {
                   {singleResult.is_fraud === 1 && (
                     <div className="result-analysis">
                       <strong>Analysis:</strong>
-                      <p>{singleResult.ai_analysis}</p>
+                      <p>{singleResult.analysis_id && pendingAnalysis === singleResult.analysis_id ? "⏳ Writing the AI analysis..." : singleResult.ai_analysis}</p>
                     </div>
                   )}
                 </div>
@@ -626,6 +662,7 @@ function DetectionView() {
                           <th>Amount</th>
                           <th>Sender Balance</th>
                           <th>Risk Score</th>
+                          <th>Reason</th>
                           <th>Priority Level</th>
                           <th>Action</th>
                         </tr>
@@ -649,6 +686,7 @@ function DetectionView() {
                               <td>${row.amount.toFixed(2)}</td>
                               <td>${row.oldbalanceOrg.toFixed(2)}</td>
                               <td>{row.XGB_Risk_Score?.toFixed(2)}</td>
+                              <td>{row.reason}</td>
                               <td>
                                 <span className={`status-${priority.level}`} style={{color: priority.color}}>
                                   {priority.icon} {isFalseAlarm ? 'FALSE ALARM' : priority.label}
@@ -729,7 +767,7 @@ function DetectionView() {
                     </h3>
                     <div style={{background: 'linear-gradient(135deg, rgba(15, 118, 110, 0.08) 0%, rgba(13, 148, 136, 0.04) 100%)', padding: '16px', borderRadius: '10px', borderLeft: '4px solid var(--primary-teal)', lineHeight: '1.8', color: 'var(--text-main)', fontSize: '0.95rem'}}>
                       <p style={{margin: '0', whiteSpace: 'pre-wrap', wordWrap: 'break-word'}}>
-                        {modalData.ai_text}
+                        {modalData.ai_pending ? "⏳ Writing the AI analysis..." : modalData.ai_text}
                       </p>
                     </div>
                   </div>
@@ -0,0 +1,157 @@
+# Scan history + the rollups the dashboard reads.
+# Every history INSERT goes through record_scan, which updates the running totals and the
+# per-day aggregates in the same transaction, so the dashboard never scans `history`.
+
+def init_history_tables(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scan_date TEXT,
+            filename TEXT,
+            total_scanned INTEGER,
+            fraud_found_xgb INTEGER,
+            fraud_found_rf INTEGER
+        )
+    ''')
+    # /history filters by date range and filename; (col, id) matches the keyset order
+    c.execute("CREATE INDEX IF NOT EXISTS idx_history_scan_date ON history (scan_date, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_history_filename ON history (filename, id)")
+
+    # Single row (id = 1) with the all-time totals
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS history_summary (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_scans INTEGER NOT NULL,
+            total_tx INTEGER NOT NULL,
+            total_fraud_xgb INTEGER NOT NULL,
+            total_fraud_rf INTEGER NOT NULL
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS history_daily (
+            day TEXT PRIMARY KEY,
+            scans INTEGER NOT NULL,
+            total_tx INTEGER NOT NULL,
+            fraud_xgb INTEGER NOT NULL,
+            fraud_rf INTEGER NOT NULL
+        )
+    ''')
+
+    # First run on an existing DB: build the rollups from the history we already have
+    c.execute("SELECT 1 FROM history_summary WHERE id = 1")
+    if c.fetchone() is None:
+        c.execute('''
+            INSERT INTO history_summary (id, total_scans, total_tx, total_fraud_xgb, total_fraud_rf)
+            SELECT 1, COUNT(*), COALESCE(SUM(total_scanned), 0),
+                   COALESCE(SUM(fraud_found_xgb), 0), COALESCE(SUM(fraud_found_rf), 0)
+            FROM history
+        ''')
+        c.execute("DELETE FROM history_daily")
+        c.execute('''
+            INSERT INTO history_daily (day, scans, total_tx, fraud_xgb, fraud_rf)
+            SELECT substr(scan_date, 1, 10), COUNT(*), COALESCE(SUM(total_scanned), 0),
+                   COALESCE(SUM(fraud_found_xgb), 0), COALESCE(SUM(fraud_found_rf), 0)
+            FROM history
+            GROUP BY substr(scan_date, 1, 10)
+        ''')
+
+
+def record_scan(c, scan_date, filename, total, xgb_fraud, rf_fraud):
+    """Insert a history row and update the rollups. Caller commits (one transaction).
+
+    Returns the new history id.
+    """
+    c.execute("INSERT INTO history (scan_date, filename, total_scanned, fraud_found_xgb, fraud_found_rf) VALUES (?, ?, ?, ?, ?)",
+              (scan_date, filename, total, xgb_fraud, rf_fraud))
+    history_id = c.lastrowid
+    c.execute('''
+        UPDATE history_summary
+        SET total_scans = total_scans + 1, total_tx = total_tx + ?,
+            total_fraud_xgb = total_fraud_xgb + ?, total_fraud_rf = total_fraud_rf + ?
+        WHERE id = 1
+    ''', (total, xgb_fraud, rf_fraud))
+    c.execute('''
+        INSERT INTO history_daily (day, scans, total_tx, fraud_xgb, fraud_rf) VALUES (?, 1, ?, ?, ?)
+        ON CONFLICT(day) DO UPDATE SET
+            scans = scans + 1, total_tx = total_tx + excluded.total_tx,
+            fraud_xgb = fraud_xgb + excluded.fraud_xgb, fraud_rf = fraud_rf + excluded.fraud_rf
+    ''', (scan_date[:10], total, xgb_fraud, rf_fraud))
+    return history_id
+
+
+def dashboard_stats(c, days=7):
+    """Totals plus the last `days` days that had scans, oldest first. Reads 1 + `days` rows."""
+    c.execute("SELECT total_scans, total_tx, total_fraud_xgb FROM history_summary WHERE id = 1")
+    row = c.fetchone()
+    total_scans, total_tx, total_fraud = row if row else (0, 0, 0)
+
+    c.execute("SELECT day, fraud_xgb, fraud_rf FROM history_daily ORDER BY day DESC LIMIT ?", (days,))
+    graph_data = [
+        {"name": day, "XGBoost": xgb, "RandomForest": rf}
+        for day, xgb, rf in c.fetchall()
+    ]
+
+    return {
+        "total_scans": total_scans,
+        "total_tx": total_tx,
+        "total_fraud": total_fraud,
+        "trend_data": graph_data[::-1] # Reverse so graph reads left-to-right
+    }
+
+
+HISTORY_FIELDS = ("id", "scan_date", "filename", "total_scanned", "fraud_found_xgb", "fraud_found_rf")
+MAX_PAGE_SIZE = 500
+
+
+def history_page(c, cursor=None, limit=50, date_from=None, date_to=None, filename=None,
+                 filename_prefix=None, fields=None):
+    """One page of history, newest first, using keyset pagination on id.
+
+    `cursor` is the `next_cursor` of the previous page. Dates are compared as
+    'YYYY-MM-DD[ HH:MM:SS]' strings; a bare date_to includes that whole day.
+    `fields` limits the returned columns (id is always included).
+    Raises ValueError for bad arguments.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    columns = list(HISTORY_FIELDS)
+    if fields:
+        unknown = [f for f in fields if f not in HISTORY_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {unknown}. Choose from {list(HISTORY_FIELDS)}")
+        columns = ["id"] + [f for f in HISTORY_FIELDS if f in fields and f != "id"]
+
+    where, params = [], []
+    if cursor is not None:
+        try:
+            where.append("id < ?")
+            params.append(int(cursor))
+        except ValueError:
+            raise ValueError("Invalid cursor")
+    if date_from:
+        where.append("scan_date >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("scan_date <= ?")
+        params.append(date_to + " 23:59:59" if len(date_to) == 10 else date_to)
+    if filename:
+        where.append("filename = ?")
+        params.append(filename)
+    if filename_prefix:
+        # Range instead of LIKE so the filename index is used
+        where.append("filename >= ? AND filename < ?")
+        params.extend([filename_prefix, filename_prefix + "\U0010ffff"])
+
+    sql = f"SELECT {', '.join(columns)} FROM history"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id DESC LIMIT ?"
+    c.execute(sql, params + [limit + 1])  # one extra row tells us if there's a next page
+    rows = c.fetchall()
+
+    items = [dict(zip(columns, row)) for row in rows[:limit]]
+    return {
+        "items": items,
+        "next_cursor": str(items[-1]["id"]) if len(rows) > limit else None,
+        "limit": limit,
+    }
@@ -0,0 +1,172 @@
+import multiprocessing
+import os
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from batch_scan import CHUNK_ROWS, scan_csv_stream
+from scoring import Scorer
+from velocity import VelocityStore
+from models import MODEL_PATHS, ModelStore
+from history_store import record_scan
+import db
+import results_store
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_UPLOAD_DIR = os.getenv("JOB_UPLOAD_DIR", "job_uploads")
+
+_executor = None
+_stores = {}  # model paths -> ModelStore; models load once per worker process, on first use
+
+
+def _store_for(paths, fingerprint=None):
+    # Jobs score with the versions that were active when they were submitted. The API's
+    # model fingerprint is part of the key, so a file retrained in place and redeployed
+    # under the same path is reloaded too. After a swap the old store is dropped, so a
+    # worker holds one set of models at a time.
+    paths = tuple(sorted((paths or MODEL_PATHS).items()))
+    key = (paths, fingerprint)
+    if key not in _stores:
+        _stores.clear()
+        _stores[key] = ModelStore(dict(paths))
+    return _stores[key]
+
+
+def init_job_tables(c):
+    """Create the job tables (schema migration 2, see MIGRATIONS in main.py)."""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS scan_jobs (
+            id TEXT PRIMARY KEY,
+            filename TEXT,
+            created_at TEXT,
+            finished_at TEXT,
+            status TEXT,
+            rows_scored INTEGER DEFAULT 0,
+            rf_flags INTEGER DEFAULT 0,
+            xgb_flags INTEGER DEFAULT 0,
+            both_agreed INTEGER DEFAULT 0,
+            history_id INTEGER,
+            error TEXT
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS scan_results (
+            job_id TEXT,
+            row_num INTEGER,
+            amount REAL,
+            oldbalanceOrg REAL,
+            newbalanceOrig REAL,
+            oldbalanceDest REAL,
+            newbalanceDest REAL,
+            RF_Prediction INTEGER,
+            RF_Risk_Score REAL,
+            XGB_Prediction INTEGER,
+            XGB_Risk_Score REAL,
+            PRIMARY KEY (job_id, row_num)
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_scan_results_risk ON scan_results (job_id, XGB_Risk_Score DESC)")
+
+
+def drop_job_results_table(c):
+    """Schema migration 3: job rows live in the columnar results store now, not in SQLite."""
+    c.execute("DROP TABLE IF EXISTS scan_results")
+
+
+def run_scan_job(job_id, csv_path, filename, thresholds=None, model_paths=None, model_fingerprint=None,
+                 chunk_rows=CHUNK_ROWS):
+    """Runs in a worker process: score the file, store every row, then add the history row.
+
+    `thresholds` are the API process's current decision thresholds, `model_paths` its
+    active model files and `model_fingerprint` their version, so jobs flag rows the
+    same way /upload-batch does.
+    """
+    pool = db.get_pool()
+    writer = None
+    try:
+        store = _store_for(model_paths, model_fingerprint)
+        scorer = Scorer(store.scorers(), thresholds)
+        # Models trained on velocity get it from the file's own history (the API's store
+        # lives in another process), clocked like data_prep: timestamp / step columns
+        velocity = VelocityStore() if store.uses_velocity() else None
+        writer = results_store.ResultsWriter(scorer.thresholds)
+        with pool.connection() as conn:
+            conn.execute("UPDATE scan_jobs SET status = 'running' WHERE id = ?", (job_id,))
+
+        def save_chunk(stats, chunk):
+            # Rows go to the columnar store only (served by /jobs/{id}/results); SQLite just tracks progress
+            writer.append(chunk)
+            with pool.transaction() as conn:
+                conn.execute(
+                    "UPDATE scan_jobs SET rows_scored = ?, rf_flags = ?, xgb_flags = ?, both_agreed = ? WHERE id = ?",
+                    (stats["total_scanned"], stats["rf_flags"], stats["xgb_flags"], stats["both_agreed"], job_id)
+                )
+
+        with open(csv_path, 'rb') as f:
+            stats, _ = scan_csv_stream(f, scorer, chunk_rows, on_chunk=save_chunk, velocity=velocity)
+
+        # Same row /save-report writes, so the scan shows up in /history and the dashboard
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with pool.transaction() as conn:
+            c = conn.cursor()
+            history_id = record_scan(c, now, filename, stats["total_scanned"], stats["xgb_flags"], stats["rf_flags"])
+            c.execute("UPDATE scan_jobs SET status = 'done', finished_at = ?, history_id = ? WHERE id = ?",
+                      (now, history_id, job_id))
+        # Columnar copy under the history id, for /scans/{history_id}/...
+        results_store.store_for_history(writer, history_id)
+    except Exception as e:
+        if writer is not None:
+            writer.abort()
+        with pool.connection() as conn:
+            conn.execute("UPDATE scan_jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+                         (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), str(e) or traceback.format_exc(limit=1), job_id))
+    finally:
+        if os.path.exists(csv_path):
+            os.remove(csv_path)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the API process has threads running (uvicorn, threadpool)
+        _executor = ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def new_upload_path():
+    os.makedirs(JOB_UPLOAD_DIR, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    return job_id, os.path.join(JOB_UPLOAD_DIR, f"{job_id}.csv")
+
+
+def submit_job(job_id, csv_path, filename, thresholds=None, model_paths=None, model_fingerprint=None):
+    """Record the job as queued and hand it to the process pool."""
+    with db.get_pool().connection() as conn:
+        conn.execute("INSERT INTO scan_jobs (id, filename, created_at, status) VALUES (?, ?, ?, 'queued')",
+                     (job_id, filename, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+    future = _get_executor().submit(run_scan_job, job_id, csv_path, filename, thresholds, model_paths,
+                                     model_fingerprint)
+
+    def mark_crashed(f):
+        # Only hit if the worker process itself died (the job marks ordinary errors itself)
+        if f.exception() is not None:
+            with db.get_pool().connection() as conn:
+                conn.execute("UPDATE scan_jobs SET status = 'failed', error = ? WHERE id = ? AND status != 'done'",
+                             (str(f.exception()), job_id))
+
+    future.add_done_callback(mark_crashed)
+
+
+def get_job(job_id):
+    with db.get_pool().connection() as conn:
+        row = conn.execute("SELECT * FROM scan_jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
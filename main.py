@@ -1,19 +1,41 @@
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-import joblib
-import pandas as pd
-import shap
 import io
 from pydantic import BaseModel
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
-import sqlite3
+import db
+import threading
 from datetime import datetime
-from fpdf import FPDF
-from fastapi.responses import FileResponse
-from typing import List
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from executors import model_pool, batch_pool, pdf_pool, db_pool, llm_pool, run_in, generate_text
+import executors
+from narratives import NarrativeService
+from explain import SHAP_MODES, attach_explanations
+from models import FAST_START
+from model_registry import SHADOW_SAMPLE_RATE, ModelRegistry
+from typing import List, Optional
+from batcher import MicroBatcher
+from batch_scan import CHUNK_ROWS, scan_csv_stream
+from scoring import FEATURE_COLS, Scorer, flag_agreement
+from stream_scoring import StreamScorer, ndjson_lines
+from reasons import reason_codes
+import jobs
+import results_store
+import metrics
+from profiler import ProfileStore
+import reports
+from history_store import init_history_tables, record_scan, dashboard_stats, history_page
+from result_cache import ResultCache, content_key, hash_fileobj
+from velocity import VELOCITY_COLS, VelocityStore, event_time
+import asyncio
+import json
+import shutil
 
 
 # 1. Initialize App
@@ -23,34 +45,39 @@ app = FastAPI(title="FraudSentry API")
 # ... app = FastAPI(...)
 
 # INITIALIZE DATABASE
+# Schema changes are versioned: append (next_version, fn(cursor)), never edit old entries.
+MIGRATIONS = [
+    (1, init_history_tables),   # history + dashboard rollups + history indexes
+    (2, jobs.init_job_tables),  # background batch-scan jobs and their per-row results
+    (3, jobs.drop_job_results_table),  # per-row job results moved to the columnar results store
+]
+
 def init_db():
-    conn = sqlite3.connect('fraud_history.db')
-    c = conn.cursor()
-    # Create table if not exists
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            scan_date TEXT,
-            filename TEXT,
-            total_scanned INTEGER,
-            fraud_found_xgb INTEGER,
-            fraud_found_rf INTEGER
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    db.migrate(db.get_pool(), MIGRATIONS)
 
 init_db() # <--- Run this immediately when app starts
 
 # CONFIGURING GEMINI
+# Optional: without a key the API still scores and explains, it just skips the AI summary.
 api_key = os.getenv("GEMINI_API_KEY") # <--- SECURELY READS THE KEY
 if not api_key:
-    raise ValueError("No API key found. Please check your .env file.")
+    print("No GEMINI_API_KEY found, AI analysis is disabled. Please check your .env file.")
+
+_llm = None
+_llm_lock = threading.Lock()
 
-genai.configure(api_key=api_key)
+def get_llm():
+    # google.generativeai is slow to import (seconds), so the client is built on the LLM
+    # pool: in the background at startup, or by the first narrative that needs it
+    global _llm
+    with _llm_lock:
+        if _llm is None:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            # CHANGED TO GEMINI 2.5 FLASH (Faster & Cheaper)
+            _llm = genai.GenerativeModel('gemini-2.5-flash')
+    return _llm
 
-# CHANGED TO GEMINI 2.5 FLASH (Faster & Cheaper)
-model = genai.GenerativeModel('gemini-2.5-flash')
 # 2. CORS (So React can talk to Python)
 app.add_middleware(
     CORSMiddleware,
@@ -60,14 +87,143 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request timing for /metrics, plus the per-request sampling profiler (see profiler.py):
+# once switched on with POST /profiler, send "X-Profile: 1" to profile that one request.
+profiles = ProfileStore()
+
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    profiler = profiles.begin() if request.headers.get("x-profile") == "1" else None
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        # Label by route template (not the raw path) and by known model types only,
+        # so the number of series stays fixed
+        route = request.scope.get("route")
+        model_type = request.query_params.get("model_type")
+        metrics.REQUEST_SECONDS.labels(
+            endpoint=route.path if route else "unmatched", method=request.method, status=status,
+            model_type=("XGB" if model_type == "XGB" else "RF") if model_type is not None else ""
+        ).observe(time.perf_counter() - start)
+        if profiler:
+            profile_id = profiles.finish(profiler, f"{request.method} {request.url.path}")
+    if profiler:
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
 # 3. Load Models
-print("Loading models...")
-rf_model = joblib.load('fraud_model.joblib')
-xgb_model = joblib.load('fraud_model_xgboost.joblib')
-print("Models loaded!")
+# With FAST_START=1 they (and their SHAP explainers) load in the background after startup,
+# or on first use; /ready reports what is loaded. The registry serves the active version of
+# each model; new versions are deployed, shadowed and swapped in at runtime (/models).
+store = ModelRegistry()
+if store.mmap and store.backend != "compiled":
+    print("MODEL_MMAP=1 only shares model pages between workers with INFERENCE_BACKEND=compiled; "
+          f"with {store.backend} every worker holds its own copy of the models.")
+if not FAST_START:
+    print("Loading models...")
+    store.warm()
+    print("Models loaded!")
+
+# 4. Scoring + SHAP
+# All scoring goes through one Scorer: a single probability pass per model, labels from
+# RF_THRESHOLD / XGB_THRESHOLD. With INFERENCE_BACKEND=compiled (the default under
+# MODEL_MMAP=1) the models inside are flattened array copies of the forests, memory-mapped
+# and shared between workers (SHAP keeps using the original models).
+# Explanations use the explainer of the model that produced the score.
+scorer = Scorer(store.scorers(), shadow=store.shadow_sample)
+
+def explain_with(model_type, X, top_n=None, mode="auto"):
+    return store.explainer(model_type).explain(X, top_n, mode)
+
+def explain_records(records, top_n=None, mode="auto"):
+    # The batch table is ranked by XGB score, so the XGB explainer is used
+    return attach_explanations(store.explainer("XGB"), records, top_n, mode)
+
+# 5. Micro-batcher: concurrent /predict calls share one predict_proba per model
+batcher = MicroBatcher(scorer.probabilities, executor=model_pool)
 
-# 4. Prepare SHAP (The Explainer)
-explainer = shap.TreeExplainer(xgb_model)
+# 6. AI narratives: generated off the request path and cached by top-3 factor signature
+def build_fraud_prompt(factor_signature):
+    # We convert the top factors to a string for the prompt
+    factors_str = ", ".join([f"{name}: {impact:.2f}" for name, impact in factor_signature])
+
+    prompt = f"""
+    You are a friendly fraud analyst explaining a risky transaction to a bank manager.
+    
+    Key Risk Factors (SHAP Impact Values): {factors_str}
+    (Note: Higher positive values mean more likely fraud. Negative values reduce fraud likelihood.)
+    
+    Please explain in simple, easy-to-understand language:
+    
+    1. **What's happening?** Describe the suspicious behavior pattern in simple terms (avoid jargon). For example: Is the account being drained? Are there unusual transfer patterns? Is the account doing something it normally doesn't?
+    
+    2. **Why is this risky?** Explain in 1-2 sentences how this pattern indicates potential fraud. You can briefly mention how the risk factors (account balance changes, transaction amount) contribute to the fraud probability.
+    
+    3. **What should we do?** Give a clear, actionable next step (e.g., "Contact the customer immediately to verify", "Flag for manual review", "Freeze account temporarily").
+    
+    Keep your response under 150 words. Use simple, direct language that anyone can understand. Avoid technical terms like "SHAP" or "machine learning" - just explain what the data shows.
+    """
+    return prompt
+
+async def generate_narrative(factor_signature):
+    # Async Gemini call, capped by the LLM pool's own limit and timeout
+    try:
+        with metrics.stage("/analysis", "llm"):
+            llm = _llm if _llm is not None else await run_in(llm_pool, get_llm)
+            return await generate_text(llm, build_fraud_prompt(factor_signature))
+    except asyncio.TimeoutError:
+        metrics.LLM_ERRORS.labels(kind="timeout").inc()
+        raise
+    except Exception:
+        metrics.LLM_ERRORS.labels(kind="error").inc()
+        raise
+
+narratives = NarrativeService(generate_narrative)
+
+# 7. Result cache: identical inputs (same feature vector / same file bytes, same thresholds
+# and options) are answered without running the models again. Keys include the model
+# fingerprint, so retrained artifacts never serve old results.
+predict_cache = ResultCache("predict")
+upload_cache = ResultCache("upload")
+
+def cache_key(cache, *parts):
+    fingerprint = store.fingerprint()
+    cache.set_fingerprint(fingerprint)
+    return content_key(fingerprint, *parts)
+
+async def cache_get(cache, key):
+    # Memory tier inline; only a miss with a disk tier goes to the db pool for the file read
+    value = cache.get_memory(key)
+    if value is None:
+        value = await run_in(db_pool, cache.get, key) if cache.disk_dir else cache.get(key)
+    return value
+
+# 8. Per-account velocity features (transfers/hour, outflow, distinct receivers), updated by
+# every /predict or /stream record that names its accounts, and by uploads with velocity=true
+# or while a model trained on them (TRAIN_VELOCITY=1) is active or shadowing.
+# Bounded by VELOCITY_MAX_ACCOUNTS; see velocity.py.
+velocity_store = VelocityStore()
+
+@app.on_event("startup")
+async def warm_models():
+    if FAST_START:
+        threading.Thread(target=store.warm, name="model-warmup", daemon=True).start()
+    if api_key:
+        llm_pool.submit(get_llm)  # off the loop; /ready shows "loaded" once it's done
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await batcher.stop()
+    jobs.shutdown()
+    reports.shutdown()
+    store.shutdown()
+    predict_cache.flush()
+    upload_cache.flush()
+    executors.shutdown()
+    db.get_pool().close()
 
 class Transaction(BaseModel):
     amount: float
@@ -75,110 +231,272 @@ class Transaction(BaseModel):
     newbalanceOrig: float
     oldbalanceDest: float
     newbalanceDest: float
+    nameOrig: Optional[str] = None  # sender / receiver ids: enable the velocity features
+    nameDest: Optional[str] = None
+    timestamp: Optional[float] = None  # event time (epoch seconds), or PaySim's step (hours);
+    step: Optional[float] = None       # without either the velocity clock is the arrival time
 
 @app.post("/predict")
-def predict_fraud(transaction: Transaction, model_type: str = "RF"):
-    # Create DataFrame
+async def predict_fraud(transaction: Transaction, model_type: str = "RF", shap_mode: str = "auto"):
+    if shap_mode not in SHAP_MODES:
+        raise HTTPException(status_code=400, detail=f"shap_mode must be one of {list(SHAP_MODES)}")
+    chosen = "XGB" if model_type == "XGB" else "RF"
+
+    # The sender's recent activity, before this transaction; this one is then added to it
+    velocity = None
+    if transaction.nameOrig:
+        with metrics.stage("/predict", "velocity"):
+            now = event_time(transaction.timestamp, transaction.step, time.time())
+            velocity = await run_in(model_pool, velocity_store.observe, transaction.nameOrig,
+                                    transaction.nameDest, now, transaction.amount)
+
+    # Feature row (the explainer builds its own frame; scoring is batched as a matrix).
+    # Balance features, then velocity (zeros for an unnamed sender, as for a new account):
+    # each model takes the columns it was trained on.
     data = [[
         transaction.amount, 
         transaction.oldbalanceOrg, 
         transaction.newbalanceOrig, 
         transaction.oldbalanceDest, 
-        transaction.newbalanceDest
+        transaction.newbalanceDest,
+        *(velocity[col] if velocity else 0.0 for col in VELOCITY_COLS)
     ]]
-    columns = ['amount', 'oldbalanceOrg', 'newbalanceOrig', 'oldbalanceDest', 'newbalanceDest']
-    df = pd.DataFrame(data, columns=columns)
 
-    # Prediction
-    if model_type == "XGB":
-        prediction = xgb_model.predict(df)[0]
-        probability = xgb_model.predict_proba(df)[0][1]
+    with metrics.stage("/predict", "cache", chosen):
+        key = cache_key(predict_cache, "predict", chosen, data[0], scorer.thresholds[chosen], shap_mode)
+        cached = await cache_get(predict_cache, key)
+    if cached is not None:
+        probability, prediction, top_factors, shap_mode_used = cached
     else:
-        prediction = rf_model.predict(df)[0]
-        probability = rf_model.predict_proba(df)[0][1]
+        # Prediction (batched with any other requests arriving at the same time)
+        with metrics.stage("/predict", "score", chosen):
+            probability = await batcher.submit(chosen, data[0])
+            prediction = scorer.label(chosen, probability)
 
-    # --- SHAP EXPLANATION (The "Why") ---
-    shap_values = explainer.shap_values(df)
-    
-    # Organize the explanation
-    feature_importance = list(zip(columns, shap_values[0]))
-    feature_importance.sort(key=lambda x: abs(x[1]), reverse=True)
-    
-    # Format for Frontend
-    top_factors = [
-        {"feature": name, "impact": float(score)} 
-        for name, score in feature_importance
-    ]
-
-    # --- ASK GEMINI FOR A SUMMARY ---
-    gemini_response = "Analysis not available."
-    
-    # We only ask Gemini if the prediction is FRAUD (1)
+        # --- SHAP EXPLANATION (The "Why") ---
+        # Explain with the same model that produced the score. "auto" falls back to the
+        # fast approximation when exact TreeSHAP would blow SHAP_BUDGET_MS (mostly RF).
+        # Format for Frontend: every feature, biggest impact first
+        with metrics.stage("/predict", "shap", chosen):
+            factors, shap_mode_used = await run_in(model_pool, explain_with, chosen, data, None, shap_mode)
+        top_factors = factors[0]
+        predict_cache.put(key, (float(probability), int(prediction), top_factors, shap_mode_used))
+    metrics.ROWS_SCORED.labels(endpoint="/predict", model_type=chosen).inc()
     if prediction == 1:
-        try:
-            # We convert the top factors to a string for the prompt
-            factors_str = ", ".join([f"{f['feature']}: {f['impact']:.2f}" for f in top_factors[:3]])
-
-            prompt = f"""
-            You are a friendly fraud analyst explaining a risky transaction to a bank manager.
-            
-            Key Risk Factors (SHAP Impact Values): {factors_str}
-            (Note: Higher positive values mean more likely fraud. Negative values reduce fraud likelihood.)
-            
-            Please explain in simple, easy-to-understand language:
-            
-            1. **What's happening?** Describe the suspicious behavior pattern in simple terms (avoid jargon). For example: Is the account being drained? Are there unusual transfer patterns? Is the account doing something it normally doesn't?
-            
-            2. **Why is this risky?** Explain in 1-2 sentences how this pattern indicates potential fraud. You can briefly mention how the risk factors (account balance changes, transaction amount) contribute to the fraud probability.
-            
-            3. **What should we do?** Give a clear, actionable next step (e.g., "Contact the customer immediately to verify", "Flag for manual review", "Freeze account temporarily").
-            
-            Keep your response under 150 words. Use simple, direct language that anyone can understand. Avoid technical terms like "SHAP" or "machine learning" - just explain what the data shows.
-            """
-            
-            response = model.generate_content(prompt)
-            gemini_response = response.text
-        except Exception as e:
-            gemini_response = f"AI Error: {str(e)}"    # This return MUST be indented inside the function!
+        metrics.FRAUD_FLAGS.labels(endpoint="/predict", model_type=chosen).inc()
+
+    # --- ASK GEMINI FOR A SUMMARY (in the background) ---
+    # We only ask Gemini if the prediction is FRAUD (1). The score goes back right away;
+    # the narrative is fetched later from /analysis/{analysis_id} (instant on a cache hit,
+    # which a repeated transaction always is: same factors, same signature).
+    analysis = narratives.request(top_factors) if prediction == 1 and api_key else None
+
     return {
         "is_fraud": int(prediction),
         "risk_score": float(probability),
         "model_used": model_type,
         "message": "Transaction flagged as suspicious!" if prediction == 1 else "Transaction appears safe.",
         "explanation": top_factors,
-        "ai_analysis": gemini_response
+        "explanation_mode": shap_mode_used,
+        "velocity": velocity,
+        "analysis_id": analysis["analysis_id"] if analysis else None,
+        "analysis_status": analysis["status"] if analysis else ("skipped" if api_key else "disabled"),
+        "ai_analysis": (analysis["ai_analysis"] or "Analysis pending.") if analysis else "Analysis not available."
+    }
+
+# --- READINESS ---
+@app.get("/ready")
+async def readiness():
+    status = {
+        "ready": store.ready(),
+        "fast_start": FAST_START,
+        "startup_seconds": round(startup_seconds, 4),
+        "llm": ("loaded" if _llm is not None else "configured") if api_key else "disabled",
+        **store.status()
     }
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+# --- DECISION THRESHOLDS ---
+# Changes apply to this worker process (and to jobs it submits from now on).
+# Set RF_THRESHOLD / XGB_THRESHOLD to make them stick across restarts.
+class ThresholdUpdate(BaseModel):
+    RF: Optional[float] = None
+    XGB: Optional[float] = None
+
+@app.get("/thresholds")
+async def get_thresholds():
+    return scorer.thresholds
+
+@app.post("/thresholds")
+async def update_thresholds(update: ThresholdUpdate):
+    try:
+        scorer.set_thresholds({k: v for k, v in update.model_dump().items() if v is not None})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return scorer.thresholds
+
+# --- AI NARRATIVES ---
+@app.get("/analysis/{analysis_id}")
+async def get_analysis(analysis_id: str, wait: float = 0):
+    # wait > 0 long-polls until the narrative is ready (capped at 60s)
+    result = await narratives.get(analysis_id, wait=min(max(wait, 0), 60))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Analysis not found (it may have expired)")
+    return result
+
+@app.get("/explainer-stats")
+async def get_explainer_stats():
+    return {name: exp.stats() for name, exp in store.explainers().items()}
+
+@app.get("/analysis-stats")
+async def get_analysis_stats():
+    return narratives.stats()
+
+# --- BATCHER STATS (for tuning BATCH_WINDOW_MS / BATCH_MAX_ROWS) ---
+@app.get("/batcher-stats")
+async def get_batcher_stats():
+    return batcher.stats()
+
+# --- METRICS (Prometheus text format) ---
+@metrics.registry.collector
+def cache_gauges():
+    gauges = []
+    for name, cache in (("predict", predict_cache), ("upload", upload_cache)):
+        st = cache.stats()
+        for key in ("hits", "disk_hits", "misses", "entries", "bytes"):
+            gauges.append((f"fraudsentry_result_cache_{key}", f"Result cache {key}", {"cache": name}, st[key]))
+    st = narratives.stats()
+    gauges.append(("fraudsentry_narratives_pending", "Gemini narratives in flight", {}, st["pending"]))
+    gauges.append(("fraudsentry_narrative_cache_hits", "Narrative cache hits", {}, st["cache"]["hits"]))
+    gauges.append(("fraudsentry_narrative_cache_misses", "Narrative cache misses", {}, st["cache"]["misses"]))
+    return gauges
+
+@metrics.registry.collector
+def shadow_gauges():
+    gauges = []
+    for model_type, st in store.shadow_stats().items():
+        labels = {"model_type": model_type, "version": st["version_id"]}
+        gauges.append(("fraudsentry_shadow_rows", "Rows re-scored by the shadow version", labels, st["rows"]))
+        if st["agreement"] is not None:
+            gauges.append(("fraudsentry_shadow_agreement", "Share of shadow rows labelled as production did",
+                           labels, st["agreement"]))
+    return gauges
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+# --- PROFILER ---
+class ProfilerSwitch(BaseModel):
+    enabled: bool
+
+@app.post("/profiler")
+async def switch_profiler(switch: ProfilerSwitch):
+    profiles.enabled = switch.enabled
+    return {"enabled": profiles.enabled, "profiles": profiles.list()}
+
+@app.get("/profiler")
+async def get_profiler():
+    return {"enabled": profiles.enabled, "profiles": profiles.list()}
+
+@app.get("/profiler/{profile_id}")
+async def get_profile(profile_id: str):
+    # Collapsed stacks, ready for flamegraph.pl or speedscope
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile["collapsed"])
+
+# --- MODEL REGISTRY ---
+# Deploys load + warm in the background: poll GET /models until the version is "active"
+# (or, with shadow=true, "ready" with stats under "shadows"). Promote or roll back with
+# /models/{version_id}/activate.
+class ModelDeploy(BaseModel):
+    model_type: str
+    path: str
+    shadow: bool = False
+    sample_rate: float = SHADOW_SAMPLE_RATE
+
+@app.get("/models")
+async def get_models():
+    return store.describe()
+
+@app.post("/models/deploy", status_code=202)
+async def deploy_model(deploy: ModelDeploy):
+    try:
+        return store.deploy(deploy.model_type, deploy.path, deploy.shadow, deploy.sample_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/models/{version_id}/activate")
+async def activate_model(version_id: str):
+    try:
+        return store.activate(version_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Version not found")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/models/{version_id}/shadow")
+async def shadow_model(version_id: str, sample_rate: float = SHADOW_SAMPLE_RATE):
+    if not 0.0 < sample_rate <= 1.0:
+        raise HTTPException(status_code=400, detail="sample_rate must be in (0, 1]")
+    try:
+        return store.start_shadow(version_id, sample_rate)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Version not found")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.delete("/models/shadow/{model_type}")
+async def stop_shadow(model_type: str):
+    final = store.stop_shadow(model_type)
+    if final is None:
+        raise HTTPException(status_code=404, detail="No shadow running for this model type")
+    return final
+
+@app.get("/velocity-stats")
+async def get_velocity_stats():
+    return velocity_store.stats()
+
+@app.get("/cache-stats")
+async def get_cache_stats():
+    return {"fingerprint": store.fingerprint(), "predict": predict_cache.stats(), "upload": upload_cache.stats()}
 
 # ... (After your single /predict function) ...
 
-@app.post("/upload-batch")
-async def upload_batch(file: UploadFile = File(...)):
+def score_upload(contents, writer=None, velocity=None):
+    """Parse and score a whole in-memory upload with both models (runs on the batch pool).
+
+    If a results_store writer is given, every scored row is persisted to it. If a
+    VelocityStore is given, velocity columns are added (see VelocityStore.observe_frame).
+    """
+    import pandas as pd
     try:
-        contents = await file.read()
-        df = pd.read_csv(io.BytesIO(contents))
+        with metrics.stage("/upload-batch", "parse"):
+            df = pd.read_csv(io.BytesIO(contents))
     except Exception:
-        raise HTTPException(status_code=400, detail="Invalid CSV file")
+        raise ValueError("Invalid CSV file")
 
-    feature_cols = ['amount', 'oldbalanceOrg', 'newbalanceOrig', 'oldbalanceDest', 'newbalanceDest']
+    feature_cols = FEATURE_COLS
     if not all(col in df.columns for col in feature_cols):
-        raise HTTPException(status_code=400, detail=f"CSV must contain columns: {feature_cols}")
+        raise ValueError(f"CSV must contain columns: {feature_cols}")
+
+    if velocity is not None:
+        with metrics.stage("/upload-batch", "velocity"):
+            velocity.observe_frame(df, time.time())
 
     # 1. Predict with BOTH models
-    input_data = df[feature_cols]
-    
-    rf_preds = rf_model.predict(input_data)      
-    rf_probs = rf_model.predict_proba(input_data)[:, 1]
-    
-    xgb_preds = xgb_model.predict(input_data)    
-    xgb_probs = xgb_model.predict_proba(input_data)[:, 1]
+    # (one probability pass per model, each on its own columns; labels come from the decision thresholds)
+    with metrics.stage("/upload-batch", "score", "RF"):
+        rf_preds, rf_probs = scorer.score("RF", df)
+    with metrics.stage("/upload-batch", "score", "XGB"):
+        xgb_preds, xgb_probs = scorer.score("XGB", df)
 
     # 2. Calculate Stats (The Fix is Here!)
     total_tx = len(df)
-    rf_count = int(sum(rf_preds))
-    xgb_count = int(sum(xgb_preds))
-    
-    # Calculate Agreement (Both models said "1")
-    agreement_count = sum([1 for r, x in zip(rf_preds, xgb_preds) if r == 1 and x == 1])
+    # Flags per model, and agreement (both models said "1"); shadow trials count the same way
+    rf_count, xgb_count, agreement_count = flag_agreement(rf_preds, xgb_preds)
 
     comparison_stats = {
         "total_scanned": total_tx,
@@ -192,16 +510,252 @@ async def upload_batch(file: UploadFile = File(...)):
     df['RF_Risk_Score'] = rf_probs
     df['XGB_Prediction'] = xgb_preds
     df['XGB_Risk_Score'] = xgb_probs 
+    df['reason'] = reason_codes(df)  # rule-based reason code for every row, one vectorized pass
+    if writer is not None:
+        with metrics.stage("/upload-batch", "persist"):
+            writer.append(df)
     
     # Sort by XGB score
-    df_sorted = df.sort_values(by='XGB_Risk_Score', ascending=False).head(100)
-    results = df_sorted.to_dict(orient="records")
+    with metrics.stage("/upload-batch", "sort"):
+        df_sorted = df.sort_values(by='XGB_Risk_Score', ascending=False).head(100)
+        results = df_sorted.to_dict(orient="records")
+
+    return comparison_stats, results
+
+@app.post("/upload-batch")
+async def upload_batch(file: UploadFile = File(...), stream: bool = False, chunk_rows: int = CHUNK_ROWS,
+                       explain: bool = False, explain_top_n: int = 0, shap_mode: str = "auto",
+                       persist: bool = False, velocity: bool = False):
+    # explain=true adds SHAP factors to every top-risk row (one matrix call, not one per row);
+    # explain_top_n keeps only the N biggest factors per row to keep the payload small.
+    # The table is ranked by XGB score, so the XGB explainer is used.
+    # persist=true keeps every row's scores on disk; pass the returned scan_id to /save-report
+    # velocity=true adds per-account velocity columns (from nameOrig / nameDest, clocked by a
+    # timestamp or step column) and feeds the rows into the velocity store, so the answer
+    # depends on what came before: such uploads skip the result cache. It is on anyway while
+    # an active or shadow model is trained on velocity.
+    if explain_top_n < 0:
+        raise HTTPException(status_code=400, detail="explain_top_n must be >= 0")
+    if shap_mode not in SHAP_MODES:
+        raise HTTPException(status_code=400, detail=f"shap_mode must be one of {list(SHAP_MODES)}")
+    if stream and chunk_rows < 1:
+        raise HTTPException(status_code=400, detail="chunk_rows must be at least 1")
+
+    velocity = velocity or await run_in(model_pool, store.uses_velocity)
+
+    # Same bytes + same options + same thresholds/models = same answer. chunk_rows only
+    # changes how the file is read, so it isn't part of the key.
+    with metrics.stage("/upload-batch", "hash"):
+        file_hash = await run_in_threadpool(hash_fileobj, file.file)
+    key = cache_key(upload_cache, "upload", file_hash, dict(scorer.thresholds), stream,
+                    explain, explain_top_n, shap_mode)
+    cached = await cache_get(upload_cache, key) if not velocity else None
+    if persist:
+        await run_in(db_pool, results_store.prune_pending)
+    if cached is not None:
+        response = {"stats": cached["stats"], "top_risky_transactions": cached["top_risky_transactions"]}
+        if not persist:
+            return response
+        # The stored per-row scores are reused too (hard-linked into a new scan)
+        scan_id = cached.get("scan_id") and await run_in(db_pool, results_store.clone_scan, cached["scan_id"])
+        if scan_id:
+            response["scan_id"] = scan_id
+            return response
+
+    writer = None
+    if persist:
+        writer = await run_in(db_pool, results_store.ResultsWriter, scorer.thresholds)
+    tracker = velocity_store if velocity else None
+
+    try:
+        if stream:
+            # Streaming mode: read the upload in chunks and keep only running counts + a top-100 heap
+            on_chunk = (lambda stats, chunk: writer.append(chunk)) if writer else None
+            with metrics.stage("/upload-batch", "stream_scan"):
+                comparison_stats, results = await run_in(
+                    batch_pool, scan_csv_stream, file.file, scorer, chunk_rows, on_chunk=on_chunk, velocity=tracker
+                )
+        else:
+            contents = await file.read()
+            comparison_stats, results = await run_in(batch_pool, score_upload, contents, writer, tracker)
+    except ValueError as e:
+        if writer:
+            writer.abort()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        if writer:
+            writer.abort()
+        raise
+
+    if explain:
+        with metrics.stage("/upload-batch", "shap", "XGB"):
+            await run_in(batch_pool, explain_records, results, explain_top_n or None, shap_mode)
+    for model_type, flags in (("RF", "rf_flags"), ("XGB", "xgb_flags")):
+        metrics.ROWS_SCORED.labels(endpoint="/upload-batch", model_type=model_type).inc(comparison_stats["total_scanned"])
+        metrics.FRAUD_FLAGS.labels(endpoint="/upload-batch", model_type=model_type).inc(comparison_stats[flags])
 
     # RETURN "stats", NOT "metrics"
-    return {
+    response = {
         "stats": comparison_stats, 
         "top_risky_transactions": results
     }
+    if writer:
+        response["scan_id"] = await run_in(db_pool, writer.close)
+    if not velocity:
+        upload_cache.put(key, response)
+    return response
+
+# --- CONTINUOUS STREAMING ---
+# NDJSON in, NDJSON out: one Transaction per line (plus an optional "id" that is echoed back),
+# one result per line in the same order: seq, id, both models' scores and flags, reason.
+# Bad lines get {"seq", "error"} in their place. See stream_scoring.py for batching/backpressure.
+class DuplexStreamingResponse(StreamingResponse):
+    # The request body is still being read while results go out, so Starlette's disconnect
+    # listener (which would swallow the body) must not run; a client that goes away shows
+    # up as ClientDisconnect from request.stream() instead.
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+async def stream_chunks(stream, lines):
+    try:
+        async for chunk in stream.results(lines):
+            yield chunk
+    except ValueError as e:
+        yield json.dumps({"error": str(e)}) + "\n"
+
+@app.post("/stream")
+async def stream_scores(request: Request, reasons: bool = True):
+    stream = StreamScorer(scorer, batch_pool, reasons, velocity=velocity_store)
+    return DuplexStreamingResponse(stream_chunks(stream, ndjson_lines(request.stream())),
+                                   media_type="application/x-ndjson")
+
+@app.websocket("/ws/stream")
+async def stream_scores_ws(websocket: WebSocket, reasons: bool = True):
+    # Each text frame holds one or more NDJSON lines; an empty frame ends the input.
+    # Results are sent as NDJSON frames (one per scored batch), then the socket is closed.
+    await websocket.accept()
+
+    async def frames():
+        while True:
+            text = await websocket.receive_text()
+            if not text:
+                return
+            yield text if text.endswith("\n") else text + "\n"
+
+    stream = StreamScorer(scorer, batch_pool, reasons, endpoint="/ws/stream", velocity=velocity_store)
+    try:
+        async for chunk in stream_chunks(stream, ndjson_lines(frames())):
+            await websocket.send_text(chunk)
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
+
+# --- STORED SCANS (per-row scores kept by persist=true uploads and batch jobs) ---
+def open_stored_scan(history_id):
+    # Reads meta.json and opens the memmaps: file I/O, so it runs on the db pool
+    if not results_store.StoredScan.exists(history_id):
+        return None
+    return results_store.StoredScan(history_id)
+
+async def load_stored_scan(history_id):
+    scan = await run_in(db_pool, open_stored_scan, history_id)
+    if scan is None:
+        raise HTTPException(status_code=404, detail="No stored scores for this scan")
+    return scan
+
+@app.get("/scans/{history_id}/results")
+async def get_stored_scan_results(history_id: int, offset: int = 0, limit: int = 100, sort: str = "xgb",
+                                  min_score: Optional[float] = None, max_score: Optional[float] = None,
+                                  score: str = "xgb"):
+    # Re-rank (sort=xgb|rf|max|mean|row) and filter by score range without running any model
+    if offset < 0 or not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="offset must be >= 0 and limit between 1 and 1000")
+    scan = await load_stored_scan(history_id)
+    try:
+        total, rows = await run_in(db_pool, scan.query, offset, limit, sort, min_score, max_score, score)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"history_id": history_id, "total": total, "offset": offset, "limit": limit, "results": rows}
+
+@app.get("/scans/{history_id}/summary")
+async def get_stored_scan_summary(history_id: int, rf_threshold: Optional[float] = None,
+                                  xgb_threshold: Optional[float] = None):
+    # Flag counts re-derived from the stored probabilities, optionally with new thresholds
+    scan = await load_stored_scan(history_id)
+    thresholds = {k: v for k, v in (("RF", rf_threshold), ("XGB", xgb_threshold)) if v is not None}
+    return await run_in(db_pool, scan.summary, thresholds)
+
+# --- BACKGROUND BATCH-SCAN JOBS ---
+# Submit a CSV, get a job id back right away, then poll / stream progress and page through results.
+@app.post("/jobs")
+async def submit_scan_job(file: UploadFile = File(...)):
+    job_id, csv_path = jobs.new_upload_path()
+
+    def save_upload():
+        with open(csv_path, 'wb') as out:
+            shutil.copyfileobj(file.file, out)
+
+    await run_in_threadpool(save_upload)
+    await run_in(db_pool, jobs.submit_job, job_id, csv_path, file.filename, dict(scorer.thresholds),
+                 store.paths, store.fingerprint())
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/jobs/{job_id}")
+async def get_scan_job(job_id: str):
+    job = await run_in(db_pool, jobs.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def stream_scan_job(job_id: str, interval: float = 0.5):
+    if await run_in(db_pool, jobs.get_job, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    # Server-Sent Events: one "data:" line per progress change, ends when the job finishes
+    async def events():
+        last = None
+        while True:
+            job = await run_in(db_pool, jobs.get_job, job_id)
+            if job != last:
+                yield f"data: {json.dumps(job)}\n\n"
+                last = job
+            if job["status"] in ("done", "failed"):
+                break
+            await asyncio.sleep(max(interval, 0.1))
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/jobs/{job_id}/results")
+async def get_scan_job_results(job_id: str, offset: int = 0, limit: int = 100, sort: str = "risk"):
+    job = await run_in(db_pool, jobs.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    if offset < 0 or not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="offset must be >= 0 and limit between 1 and 1000")
+
+    # Served from the job's columnar copy under its history id; sort=risk|row or any /scans sort
+    scan = await load_stored_scan(job["history_id"])
+    try:
+        _, rows = await run_in(db_pool, scan.query, offset, limit, {"risk": "xgb"}.get(sort, sort))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "job_id": job_id,
+        "history_id": job["history_id"],
+        "stats": {
+            "total_scanned": job["rows_scored"],
+            "rf_flags": job["rf_flags"],
+            "xgb_flags": job["xgb_flags"],
+            "both_agreed": job["both_agreed"]
+        },
+        "offset": offset,
+        "limit": limit,
+        "results": rows
+    }
+
 # --- DEFINE THE DATA STRUCTURE ---
 class ReportRequest(BaseModel):
     filename: str
@@ -210,221 +764,97 @@ class ReportRequest(BaseModel):
     rf_fraud: int
     confirmed_frauds: List[dict]
     false_alarms: List[dict]
+    scan_id: Optional[str] = None  # from /upload-batch?persist=true, links the stored scores to this history row
 
 # --- THE FIXED ENDPOINT ---
 @app.post("/save-report")
 async def save_report(request: ReportRequest):
-    # 1. SAVE TO DATABASE
-    conn = sqlite3.connect('fraud_history.db')
-    c = conn.cursor()
     date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    c.execute("INSERT INTO history (scan_date, filename, total_scanned, fraud_found_xgb, fraud_found_rf) VALUES (?, ?, ?, ?, ?)",
-              (date_str, request.filename, request.total, request.xgb_fraud, request.rf_fraud))
-    conn.commit()
-    conn.close()
+
+    # 1. SAVE TO DATABASE
+    with metrics.stage("/save-report", "db"):
+        history_id = await run_in(db_pool, insert_history, date_str, request)
+    if request.scan_id:
+        try:
+            await run_in(db_pool, results_store.link_to_history, request.scan_id, history_id)
+        except ValueError:
+            pass  # not a scan id we handed out; the report is still saved
 
     # 2. GENERATE PROFESSIONAL PDF REPORT
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_left_margin(10)
-    pdf.set_right_margin(10)
-    pdf.set_font("Arial", size=11)
-    
-    # --- HEADER WITH DATE ---
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(190, 10, txt="FraudSentry Audit Report", ln=True, align='C')
-    
-    # Date at top
-    pdf.set_font("Arial", size=9)
-    date_formatted = datetime.now().strftime("%A, %d %b %Y")  # e.g., "Thursday, 18 Dec 2025"
-    pdf.cell(190, 6, txt=date_formatted, ln=True, align='C')
-    pdf.ln(3)
-    
-    # --- SUMMARY BOX - COMPACT ---
-    pdf.set_font("Arial", 'B', 10)
-    pdf.set_fill_color(200, 220, 240)  # Light blue background
-    pdf.cell(190, 7, txt="SCAN SUMMARY", ln=True, align='L', fill=True, border=1)
-    
-    pdf.set_font("Arial", size=9)
-    pdf.set_fill_color(245, 245, 245)  # Light gray background
-    confirmed_count = len(request.confirmed_frauds)
-    pdf.cell(190, 6, txt=f"  Confirmed Frauds: {confirmed_count}  |  Total Scanned: {request.total}  |  File: {request.filename[:25]}", ln=True, fill=True, border=1)
-    pdf.ln(4)
-    
-    # --- TABLE 1: CONFIRMED FRAUDS (RED TITLE) ---
-    if request.confirmed_frauds:
-        pdf.set_font("Arial", 'B', 12)
-        pdf.set_text_color(220, 20, 20)  # Red color
-        pdf.cell(200, 10, txt="TABLE 1: CONFIRMED FRAUD TRANSACTIONS", ln=True)
-        pdf.set_text_color(0, 0, 0)  # Reset to black
-        
-        # Table headers - optimized column widths
-        pdf.set_font("Arial", 'B', 8)
-        pdf.set_fill_color(220, 20, 20)  # Red background
-        pdf.set_text_color(255, 255, 255)  # White text
-        
-        col_widths = [20, 20, 18, 22, 30]  # Tighter widths, reduced Reason column
-        headers = ["Amount", "Sender Bal", "Risk", "Status", "Reason"]
-        for i, header in enumerate(headers):
-            pdf.cell(col_widths[i], 7, txt=header, border=1, align='C', fill=True)
-        pdf.ln()
-        
-        # Table rows
-        pdf.set_font("Arial", size=7)
-        pdf.set_text_color(0, 0, 0)  # Reset to black
-        pdf.set_fill_color(255, 240, 240)  # Light red background
-        
-        for row in request.confirmed_frauds[:20]:
-            amount = f"${row.get('amount', 0):.0f}"
-            sender_bal = f"${row.get('oldbalanceOrg', 0):.0f}"
-            risk_score = f"{row.get('XGB_Risk_Score', 0):.2f}"
-            status = "HIGH PRIORITY" if row.get('RF_Prediction') == 1 else "WARNING"
-            reason = generate_fraud_reason(row)[:15]  # Truncate to 15 chars
-            
-            pdf.cell(col_widths[0], 6, txt=amount, border=1, fill=True, align='R')
-            pdf.cell(col_widths[1], 6, txt=sender_bal, border=1, fill=True, align='R')
-            pdf.cell(col_widths[2], 6, txt=risk_score, border=1, fill=True, align='C')
-            pdf.cell(col_widths[3], 6, txt=status, border=1, fill=True, align='C')
-            pdf.cell(col_widths[4], 6, txt=reason, border=1, fill=True, align='L')
-            pdf.ln()
-        
-        pdf.ln(4)
-    
-    # --- TABLE 2: FALSE ALARMS (ORANGE TITLE) ---
-    if request.false_alarms:
-        pdf.set_font("Arial", 'B', 12)
-        pdf.set_text_color(245, 130, 0)  # Orange color
-        pdf.cell(200, 10, txt="TABLE 2: FALSE ALARM CANDIDATES (ANALYST REVIEWED)", ln=True)
-        pdf.set_text_color(0, 0, 0)  # Reset to black
-        
-        # Table headers - optimized column widths
-        pdf.set_font("Arial", 'B', 8)
-        pdf.set_fill_color(245, 130, 0)  # Orange background
-        pdf.set_text_color(255, 255, 255)  # White text
-        
-        col_widths = [20, 20, 18, 18, 34]  # Tighter widths
-        headers = ["Amount", "Sender Bal", "Risk", "XGB", "Analyst Notes"]
-        for i, header in enumerate(headers):
-            pdf.cell(col_widths[i], 7, txt=header, border=1, align='C', fill=True)
-        pdf.ln()
-        
-        # Table rows
-        pdf.set_font("Arial", size=7)
-        pdf.set_text_color(0, 0, 0)  # Reset to black
-        pdf.set_fill_color(255, 250, 240)  # Light orange background
-        
-        for row in request.false_alarms[:20]:
-            amount = f"${row.get('amount', 0):.0f}"
-            sender_bal = f"${row.get('oldbalanceOrg', 0):.0f}"
-            risk_score = f"{row.get('XGB_Risk_Score', 0):.2f}"
-            xgb_flag = "Yes" if row.get('XGB_Prediction') == 1 else "No"
-            notes = "Reviewed & Cleared"
-            
-            pdf.cell(col_widths[0], 6, txt=amount, border=1, fill=True, align='R')
-            pdf.cell(col_widths[1], 6, txt=sender_bal, border=1, fill=True, align='R')
-            pdf.cell(col_widths[2], 6, txt=risk_score, border=1, fill=True, align='C')
-            pdf.cell(col_widths[3], 6, txt=xgb_flag, border=1, fill=True, align='C')
-            pdf.cell(col_widths[4], 6, txt=notes, border=1, fill=True, align='L')
-            pdf.ln()
-        
-        pdf.ln(4)
-    
-    # --- FOOTER ---
-    pdf.set_font("Arial", 'I', 8)
-    pdf.set_text_color(128, 128, 128)
-    pdf.ln(10)
-    pdf.cell(190, 6, txt="Generated by FraudSentry - Intelligent Fraud Detection System", ln=True, align='C')
-    pdf.cell(190, 4, txt=f"Report ID: {timestamp}  |  Status: AUDIT REPORT", ln=True, align='C')
-    
-    # Save PDF
-    report_filename = f"FraudSentry_Report_{timestamp}.pdf"
-    pdf.output(report_filename)
-    
-    return FileResponse(report_filename, media_type='application/pdf', filename=report_filename)
+    # Rendered in memory and streamed back; the archive copy (if enabled) goes to REPORTS_DIR
+    filename = reports.report_filename(timestamp)
+    pdf_bytes = await run_in(pdf_pool, render_and_archive, request.model_dump(), timestamp, filename)
+
+    return StreamingResponse(io.BytesIO(pdf_bytes), media_type='application/pdf', headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Content-Length": str(len(pdf_bytes)),
+        "X-History-Id": str(history_id),
+    })
+
+
+def render_and_archive(report, timestamp, filename):
+    with metrics.stage("/save-report", "pdf"):
+        pdf_bytes = reports.render_report(report, timestamp, dict(scorer.thresholds))
+    with metrics.stage("/save-report", "archive"):
+        reports.archive_report(pdf_bytes, filename)
+    return pdf_bytes
+
+
+# --- BULK REPORTS ---
+# Renders many reports across worker processes and returns them as one zip.
+# Nothing is written to history; use /save-report for that.
+class BulkReportRequest(BaseModel):
+    reports: List[ReportRequest]
+
+@app.post("/reports/bulk")
+async def bulk_reports(request: BulkReportRequest):
+    if not request.reports:
+        raise HTTPException(status_code=400, detail="No reports to render")
+    payloads = [r.model_dump() for r in request.reports]
+    rendered = await run_in(pdf_pool, reports.render_many, payloads, dict(scorer.thresholds))
+    archive = await run_in(pdf_pool, reports.zip_reports, rendered)
+    return StreamingResponse(io.BytesIO(archive), media_type='application/zip', headers={
+        "Content-Disposition": 'attachment; filename="FraudSentry_Reports.zip"',
+        "Content-Length": str(len(archive)),
+    })
+
+
+def insert_history(date_str, request):
+    # History row + dashboard rollups, one transaction. Goes through the group-commit
+    # writer, so concurrent report saves share a commit instead of fighting for the lock.
+    return db.get_pool().write(
+        record_scan, date_str, request.filename, request.total, request.xgb_fraud, request.rf_fraud
+    ).result()
 
 
-def generate_fraud_reason(row):
-    """Generate a user-friendly fraud reason based on transaction patterns"""
-    reasons = []
-    
-    # Check for account draining (high amount, low remaining balance)
-    if row.get('amount', 0) > 50000:
-        new_balance = row.get('newbalanceOrig', 0)
-        if new_balance < 1000:
-            return "Account Draining"
-    
-    # Check for rapid transfers (high balance change)
-    balance_change = abs(row.get('newbalanceOrig', 0) - row.get('oldbalanceOrg', 0))
-    if balance_change > 100000:
-        return "Rapid Transfer"
-    
-    # Check for unusual patterns (receiver balance spike)
-    dest_balance_change = abs(row.get('newbalanceDest', 0) - row.get('oldbalanceDest', 0))
-    if dest_balance_change > 150000:
-        return "Unusual Recipient"
-    
-    # Check for structuring (multiple moderate transfers)
-    if 10000 < row.get('amount', 0) < 50000:
-        if row.get('oldbalanceOrg', 0) > row.get('newbalanceOrig', 0):
-            return "Structuring Pattern"
-    
-    # Default reason
-    return "Anomalous Activity"
     # --- GET HISTORY ENDPOINT ---
 @app.get("/history")
-async def get_history():
-    conn = sqlite3.connect('fraud_history.db')
-    conn.row_factory = sqlite3.Row # Allows accessing columns by name
-    c = conn.cursor()
-    
-    # Fetch all records, newest first
-    c.execute("SELECT * FROM history ORDER BY id DESC")
-    rows = c.fetchall()
-    conn.close()
-    
-    return rows
+async def get_history(cursor: Optional[str] = None, limit: int = 50, date_from: Optional[str] = None,
+                      date_to: Optional[str] = None, filename: Optional[str] = None,
+                      filename_prefix: Optional[str] = None, fields: Optional[str] = None):
+    # Keyset pagination: pass the previous page's next_cursor to get the next (older) page.
+    # fields is a comma-separated projection, e.g. fields=scan_date,filename
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        return await run_in(db_pool, fetch_history, cursor, limit, date_from, date_to,
+                            filename, filename_prefix, field_list)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def fetch_history(cursor=None, limit=50, date_from=None, date_to=None, filename=None,
+                  filename_prefix=None, fields=None):
+    with db.get_pool().connection() as conn:
+        # One page of records, newest first
+        return history_page(conn.cursor(), cursor, limit, date_from, date_to, filename, filename_prefix, fields)
     # --- DASHBOARD STATS ENDPOINT ---
 @app.get("/dashboard-stats")
 async def get_dashboard_stats():
-    conn = sqlite3.connect('fraud_history.db')
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    
-    # 1. Basic Counts
-    c.execute("SELECT COUNT(*) FROM history")
-    row = c.fetchone()
-    total_scans = row[0] if row else 0
-    
-    c.execute("SELECT SUM(total_scanned) FROM history")
-    row = c.fetchone()
-    total_tx = row[0] if row and row[0] else 0
-    
-    c.execute("SELECT SUM(fraud_found_xgb) FROM history")
-    row = c.fetchone()
-    total_fraud = row[0] if row and row[0] else 0
-    
-    # 2. Graph Data: Group by Date (Take the last 7 scans/entries)
-    c.execute("SELECT scan_date, fraud_found_xgb, fraud_found_rf FROM history ORDER BY id DESC LIMIT 7")
-    rows = c.fetchall()
-    
-    # Convert to list of dicts and reverse (so it goes Old -> New)
-    graph_data = []
-    for row in rows:
-        # Simplify date to just the YYYY-MM-DD part
-        short_date = row['scan_date'].split(' ')[0] 
-        graph_data.append({
-            "name": short_date,
-            "XGBoost": row['fraud_found_xgb'],
-            "RandomForest": row['fraud_found_rf']
-        })
-    
-    conn.close()
-    
-    return {
-        "total_scans": total_scans,
-        "total_tx": total_tx,
-        "total_fraud": total_fraud,
-        "trend_data": graph_data[::-1] # Reverse so graph reads left-to-right
-    }
\ No newline at end of file
+    return await run_in(db_pool, fetch_dashboard_stats)
+
+def fetch_dashboard_stats():
+    with db.get_pool().connection() as conn:
+        # Reads the pre-aggregated rollups (O(1) rows), trend grouped by real day
+        return dashboard_stats(conn.cursor())
+
+startup_seconds = time.perf_counter() - _import_started
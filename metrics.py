@@ -0,0 +1,167 @@
+import threading
+import time
+
+
+class Histogram:
+    """Fixed-bucket histogram. Counts are cumulative per upper bound, like Prometheus."""
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "buckets": {str(bound): n for bound, n in zip(self.buckets, self.counts)},
+                "count": self.count,
+                "sum": self.sum,
+                "mean": self.sum / self.count if self.count else 0.0,
+            }
+
+
+# --- LABELLED METRICS + PROMETHEUS TEXT FORMAT ---
+# One process-wide registry; /metrics renders it. Label values are kept to small,
+# fixed sets (endpoint route, stage, model type) so series counts stay bounded.
+LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Family:
+    """A named metric with one child (Histogram or Counter) per label combination."""
+
+    def __init__(self, kind, name, help_text, labels, factory):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._factory())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            base = [f"{name}={_quote(value)}" for name, value in zip(self.label_names, key)]
+            if self.kind == "counter":
+                lines.append(f"{self.name}{_labels(base)} {_number(child.value)}")
+                continue
+            snap = child.snapshot()
+            for bound, count in [*snap["buckets"].items(), ("+Inf", snap["count"])]:
+                lines.append(f"{self.name}_bucket{_labels(base + ['le=' + _quote(bound)])} {count}")
+            lines.append(f"{self.name}_sum{_labels(base)} {_number(snap['sum'])}")
+            lines.append(f"{self.name}_count{_labels(base)} {snap['count']}")
+        return lines
+
+
+def _quote(value):
+    return '"' + _escape(str(value)) + '"'
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self._families = []
+        self._collectors = []
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        family = Family("histogram", name, help_text, labels, lambda: Histogram(buckets))
+        self._families.append(family)
+        return family
+
+    def counter(self, name, help_text, labels=()):
+        family = Family("counter", name, help_text, labels, Counter)
+        self._families.append(family)
+        return family
+
+    def collector(self, fn):
+        """fn() -> [(name, help, {label: value}, value)] gauges, read at scrape time."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for family in self._families:
+            lines.extend(family.render())
+        seen = set()
+        for fn in self._collectors:
+            for name, help_text, labels, value in fn():
+                if name not in seen:
+                    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+                    seen.add(name)
+                pairs = [f"{k}={_quote(v)}" for k, v in labels.items()]
+                lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    "fraudsentry_request_seconds", "Request latency by endpoint", ("endpoint", "method", "status", "model_type"))
+STAGE_SECONDS = registry.histogram(
+    "fraudsentry_stage_seconds", "Time spent in each stage of a request", ("endpoint", "stage", "model_type"))
+MODEL_SECONDS = registry.histogram(
+    "fraudsentry_model_seconds", "Scorer time: DataFrame construction vs predict_proba", ("model_type", "stage"))
+FRAUD_FLAGS = registry.counter(
+    "fraudsentry_fraud_flags_total", "Transactions flagged as fraud", ("endpoint", "model_type"))
+ROWS_SCORED = registry.counter(
+    "fraudsentry_rows_scored_total", "Transactions scored", ("endpoint", "model_type"))
+LLM_ERRORS = registry.counter(
+    "fraudsentry_llm_errors_total", "Failed Gemini calls", ("kind",))
+
+
+class timed:
+    """Context manager: observe the elapsed time of a block into a histogram family."""
+
+    def __init__(self, family, **labels):
+        self.hist = family.labels(**labels)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.start)
+        return False
+
+
+def stage(endpoint, name, model_type=""):
+    return timed(STAGE_SECONDS, endpoint=endpoint, stage=name, model_type=model_type)
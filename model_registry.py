@@ -0,0 +1,359 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import metrics
+from models import BACKEND, MODEL_MMAP, MODEL_PATHS, LazyScorers, ModelStore
+from scoring import MODEL_TYPES, SERVING_COLS, feature_frame, flag_agreement
+from tree_engine import parity_sample
+
+# Versioned model registry.
+# Every model file deployed becomes a version (RF-1, XGB-2, ...) with its own ModelStore.
+# A new version loads and warms (scoring copy, SHAP explainer, a synthetic batch through
+# both) on a background thread while the current version keeps serving; then it is
+# swapped in by replacing a single reference, so requests never wait and in-flight ones
+# finish on the model they started with. The previous version stays loaded for rollback.
+# Or the version runs as a shadow: a sampled share of production batches is re-scored
+# by it on its own worker thread, off the request path, and agreement and latency
+# against production are recorded.
+REGISTRY_MODEL_DIR = os.getenv("REGISTRY_MODEL_DIR", ".")  # deployable files must live under here
+REGISTRY_KEEP_LOADED = int(os.getenv("REGISTRY_KEEP_LOADED", "1"))  # inactive versions kept in memory per type
+WARMUP_ROWS = int(os.getenv("REGISTRY_WARMUP_ROWS", "256"))
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.1"))
+SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", "32"))  # queued shadow batches; beyond that samples are dropped
+SHADOW_LATENCY_SAMPLES = 1000
+
+
+class ModelVersion:
+    """One deployed model file. state: loading -> ready | failed; ready <-> active; retired once unloaded."""
+
+    def __init__(self, version_id, model_type, path, backend, mmap):
+        self.version_id = version_id
+        self.model_type = model_type
+        self.path = path
+        self.store = ModelStore({model_type: path}, backend, mmap)
+        self.state = "loading"
+        self.error = None
+        self.created = time.time()
+        self.activated = None
+        self.warmup = None
+
+    def load(self, explainers=True):
+        """Load the scoring copy (and explainer), then push a synthetic batch through them."""
+        start = time.perf_counter()
+        self.store.warm(explainers)
+        features = self.store.features(self.model_type)
+        unknown = [col for col in features if col not in SERVING_COLS]
+        if unknown:
+            raise ValueError(f"Model needs columns the API doesn't have: {unknown}")
+        X = feature_frame(parity_sample(WARMUP_ROWS, seed=1, width=len(SERVING_COLS)))
+        t = time.perf_counter()
+        probs = self.store.scoring_model(self.model_type).predict_proba(X[features])[:, 1]
+        predict_ms = (time.perf_counter() - t) * 1000
+        if not np.all(np.isfinite(probs)) or probs.min() < 0 or probs.max() > 1:
+            raise ValueError("Warm-up batch produced invalid probabilities")
+        explain_ms = None
+        if explainers:
+            t = time.perf_counter()
+            self.store.explainer(self.model_type).explain(X.iloc[:16], None, "auto")
+            explain_ms = (time.perf_counter() - t) * 1000
+        self.warmup = {
+            "rows": WARMUP_ROWS,
+            "seconds": round(time.perf_counter() - start, 4),
+            "predict_ms": round(predict_ms, 3),
+            "explain_ms": round(explain_ms, 3) if explain_ms is not None else None,
+            "flag_rate": round(float((probs > 0.5).mean()), 4),
+        }
+
+    def describe(self):
+        st = self.store.status() if self.store is not None else {}
+        return {
+            "version_id": self.version_id,
+            "model_type": self.model_type,
+            "path": self.path,
+            "state": self.state,
+            "error": self.error,
+            "created": self.created,
+            "activated": self.activated,
+            "fingerprint": st.get("fingerprint"),
+            "features": st.get("features", {}).get(self.model_type),
+            "load_seconds": st.get("load_seconds"),
+            "warmup": self.warmup,
+        }
+
+
+class ShadowTrial:
+    """Agreement / latency of a candidate version against production, on sampled batches."""
+
+    def __init__(self, version, sample_rate):
+        self.version = version
+        self.sample_rate = sample_rate
+        self.started = time.time()
+        self.batches = self.rows = self.dropped = self.errors = 0
+        self.agreed_rows = self.production_flags = self.shadow_flags = self.both_flagged = 0
+        self.abs_diff_sum = 0.0
+        self.max_abs_diff = 0.0
+        self.production_ms = deque(maxlen=SHADOW_LATENCY_SAMPLES)
+        self.shadow_ms = deque(maxlen=SHADOW_LATENCY_SAMPLES)
+
+    def record(self, production_probs, shadow_probs, threshold, production_seconds, shadow_seconds):
+        production_preds = production_probs > threshold
+        shadow_preds = shadow_probs > threshold
+        production_flags, shadow_flags, both = flag_agreement(production_preds, shadow_preds)
+        diff = np.abs(production_probs - shadow_probs)
+        self.batches += 1
+        self.rows += len(production_probs)
+        self.agreed_rows += int((production_preds == shadow_preds).sum())
+        self.production_flags += production_flags
+        self.shadow_flags += shadow_flags
+        self.both_flagged += both
+        self.abs_diff_sum += float(diff.sum())
+        self.max_abs_diff = max(self.max_abs_diff, float(diff.max()) if len(diff) else 0.0)
+        self.production_ms.append(production_seconds * 1000)
+        self.shadow_ms.append(shadow_seconds * 1000)
+
+    @staticmethod
+    def _latency(ms):
+        if not ms:
+            return None
+        return {f"p{p}_ms": round(float(np.percentile(ms, p)), 4) for p in (50, 99)}
+
+    def stats(self):
+        return {
+            "version_id": self.version.version_id,
+            "sample_rate": self.sample_rate,
+            "started": self.started,
+            "batches": self.batches,
+            "rows": self.rows,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "agreement": round(self.agreed_rows / self.rows, 6) if self.rows else None,
+            "production_flags": self.production_flags,
+            "shadow_flags": self.shadow_flags,
+            "both_flagged": self.both_flagged,
+            "mean_abs_diff": round(self.abs_diff_sum / self.rows, 6) if self.rows else None,
+            "max_abs_diff": round(self.max_abs_diff, 6),
+            "production_latency": self._latency(self.production_ms),
+            "shadow_latency": self._latency(self.shadow_ms),
+        }
+
+
+class ModelRegistry:
+    """Active version per model type (+ optional shadow). Answers with the same interface
+    as ModelStore, always from the active versions."""
+
+    def __init__(self, paths=MODEL_PATHS, backend=BACKEND, mmap=MODEL_MMAP):
+        self.backend = backend
+        self.mmap = mmap
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._counters = dict.fromkeys(MODEL_TYPES, 0)
+        self._active = {}   # model_type -> ModelVersion; replaced as a whole on every swap
+        self._shadows = {}  # model_type -> ShadowTrial; same
+        self._pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        for model_type, path in paths.items():
+            version = self._new_version(model_type, path)
+            version.state = "active"
+            version.activated = time.time()
+            self._active[model_type] = version
+
+    def _new_version(self, model_type, path):
+        with self._lock:
+            self._counters[model_type] += 1
+            version = ModelVersion(f"{model_type}-{self._counters[model_type]}", model_type, path,
+                                   self.backend, self.mmap)
+            self._versions[version.version_id] = version
+        return version
+
+    # --- ModelStore interface (active versions) ---
+    @property
+    def paths(self):
+        return {name: version.path for name, version in self._active.items()}
+
+    def model(self, name):
+        return self._active[name].store.model(name)
+
+    def scoring_model(self, name):
+        return self._active[name].store.scoring_model(name)
+
+    def explainer(self, name):
+        return self._active[name].store.explainer(name)
+
+    def explainers(self):
+        return {name: explainer for version in self._active.values()
+                for name, explainer in version.store.explainers().items()}
+
+    def scorers(self):
+        return LazyScorers(self)
+
+    def features(self, name):
+        return self._active[name].store.features(name)
+
+    def uses_velocity(self):
+        """True if an active or shadow version needs the velocity columns (loads them if needed)."""
+        versions = [*self._active.values(), *(trial.version for trial in self._shadows.values())]
+        stores = [version.store for version in versions]
+        return any(store is not None and store.uses_velocity() for store in stores)
+
+    def fingerprint(self):
+        """Changes whenever an active version does, so caches keyed on it drop old results."""
+        active = [[name, v.version_id, v.store.fingerprint()] for name, v in sorted(self._active.items())]
+        return hashlib.sha256(json.dumps(active).encode()).hexdigest()[:16]
+
+    def warm(self, explainers=True):
+        for version in list(self._active.values()):
+            version.load(explainers)
+
+    def ready(self):
+        return all(version.store.ready() for version in self._active.values())
+
+    def status(self):
+        stores = [version.store.status() for version in self._active.values()]
+        return {
+            "backend": self.backend,
+            "mmap": self.mmap,
+            "shared_pages": sorted(n for st in stores for n in st["shared_pages"]),
+            "models": sorted(n for st in stores for n in st["models"]),
+            "scorers": sorted(n for st in stores for n in st["scorers"]),
+            "explainers": sorted(n for st in stores for n in st["explainers"]),
+            "features": {k: v for st in stores for k, v in st["features"].items()},
+            "fingerprint": self.fingerprint(),
+            "active": {name: version.version_id for name, version in self._active.items()},
+            "load_seconds": {k: v for st in stores for k, v in st["load_seconds"].items()},
+        }
+
+    # --- Deploys ---
+    def deploy(self, model_type, path, shadow=False, sample_rate=SHADOW_SAMPLE_RATE):
+        """Start loading a new version in the background. Raises ValueError for bad input."""
+        if model_type not in MODEL_TYPES:
+            raise ValueError(f"model_type must be one of {list(MODEL_TYPES)}")
+        if not 0.0 < sample_rate <= 1.0:
+            raise ValueError("sample_rate must be in (0, 1]")
+        root = os.path.realpath(REGISTRY_MODEL_DIR)
+        real = os.path.realpath(path)
+        if os.path.commonpath([root, real]) != root or not real.endswith(".joblib"):
+            raise ValueError(f"Model files must be .joblib files under {REGISTRY_MODEL_DIR}")
+        if not os.path.isfile(real):
+            raise ValueError(f"No such model file: {path}")
+        version = self._new_version(model_type, path)
+        threading.Thread(target=self._load_and_install, args=(version, shadow, sample_rate),
+                         name=f"deploy-{version.version_id}", daemon=True).start()
+        return version.describe()
+
+    def _load_and_install(self, version, shadow, sample_rate):
+        try:
+            version.load()
+        except Exception as e:
+            version.state = "failed"
+            version.error = str(e) or type(e).__name__
+            version.store = None
+            return
+        version.state = "ready"
+        if shadow:
+            self.start_shadow(version.version_id, sample_rate)
+        else:
+            self.activate(version.version_id)
+
+    def _loaded(self, version_id):
+        version = self._versions.get(version_id)
+        if version is None:
+            raise KeyError(version_id)
+        if version.state not in ("ready", "active"):
+            raise ValueError(f"Version {version_id} is {version.state}")
+        return version
+
+    def activate(self, version_id):
+        """Swap a loaded version in (promote a shadow, or roll back to the previous version)."""
+        with self._lock:
+            version = self._loaded(version_id)
+            model_type = version.model_type
+            previous = self._active[model_type]
+            self._active = {**self._active, model_type: version}
+            if previous is not version:
+                previous.state = "ready"
+                version.state = "active"
+                version.activated = time.time()
+            trial = self._shadows.get(model_type)
+            if trial is not None and trial.version is version:
+                self._shadows = {k: v for k, v in self._shadows.items() if k != model_type}
+            self._unload_inactive(model_type)
+        return version.describe()
+
+    def _unload_inactive(self, model_type):
+        # Newest inactive versions stay loaded for rollback; older ones are dropped
+        shadowing = {trial.version for trial in self._shadows.values()}
+        inactive = [v for v in self._versions.values()
+                    if v.model_type == model_type and v.state == "ready" and v not in shadowing]
+        for version in sorted(inactive, key=lambda v: v.activated or v.created, reverse=True)[REGISTRY_KEEP_LOADED:]:
+            version.state = "retired"
+            version.store = None
+
+    # --- Shadow scoring ---
+    def start_shadow(self, version_id, sample_rate=SHADOW_SAMPLE_RATE):
+        with self._lock:
+            version = self._loaded(version_id)
+            if version.state == "active":
+                raise ValueError(f"Version {version_id} is already serving")
+            self._shadows = {**self._shadows, version.model_type: ShadowTrial(version, sample_rate)}
+        return self._shadows[version.model_type].stats()
+
+    def stop_shadow(self, model_type):
+        """End the trial for a model type; returns its final stats (None if there was none)."""
+        with self._lock:
+            trial = self._shadows.get(model_type)
+            if trial is None:
+                return None
+            self._shadows = {k: v for k, v in self._shadows.items() if k != model_type}
+            self._unload_inactive(model_type)
+        return trial.stats()
+
+    def shadow_sample(self, model_type, X, probs, seconds, threshold):
+        """Scorer hook: maybe queue this production batch for the shadow version of model_type."""
+        trial = self._shadows.get(model_type)
+        if trial is None or random.random() >= trial.sample_rate:
+            return
+        with self._lock:
+            if self._pending >= SHADOW_MAX_PENDING:
+                trial.dropped += 1
+                return
+            self._pending += 1
+        self._executor.submit(self._run_shadow, trial, X, np.array(probs, dtype=np.float64), seconds, threshold)
+
+    def _run_shadow(self, trial, X, probs, seconds, threshold):
+        try:
+            store = trial.version.store
+            if store is None:
+                return
+            with metrics.timed(metrics.MODEL_SECONDS, model_type=trial.version.model_type, stage="shadow"):
+                start = time.perf_counter()
+                model_type = trial.version.model_type
+                shadow_probs = store.scoring_model(model_type).predict_proba(X[store.features(model_type)])[:, 1]
+                shadow_seconds = time.perf_counter() - start
+            trial.record(probs, shadow_probs, threshold, seconds, shadow_seconds)
+        except Exception:
+            trial.errors += 1
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shadow_stats(self):
+        return {model_type: trial.stats() for model_type, trial in self._shadows.items()}
+
+    def describe(self):
+        return {
+            "active": {name: version.version_id for name, version in self._active.items()},
+            "fingerprint": self.fingerprint(),
+            "shadows": self.shadow_stats(),
+            "versions": [version.describe() for version in self._versions.values()],
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
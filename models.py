@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from scoring import model_features, uses_velocity
+from tree_engine import (INFERENCE_BACKEND, PARITY_TOLERANCE, CompiledForest, compile_model, load_compiled,
+                         max_parity_error, parity_sample, save_compiled)
+
+MODEL_PATHS = {
+    "RF": 'fraud_model.joblib',
+    "XGB": 'fraud_model_xgboost.joblib',
+}
+
+# FAST_START=1: nothing heavy is loaded at import; models, compiled forests and
+# explainers load on first use (or from a background warm-up started at startup).
+FAST_START = os.getenv("FAST_START", "0") == "1"
+# Memory-map the compiled forests' node arrays, so every worker process maps the same
+# page-cache pages instead of holding a private copy. Only the compiled backend can share:
+# sklearn's Tree and XGBoost's Booster copy their arrays into private memory when they
+# are unpickled, mmap or not. So MODEL_MMAP=1 (the FAST_START default) scores with the
+# compiled backend unless INFERENCE_BACKEND is set explicitly.
+MODEL_MMAP = os.getenv("MODEL_MMAP", "1" if FAST_START else "0") == "1"
+BACKEND = "compiled" if MODEL_MMAP and not os.getenv("INFERENCE_BACKEND") else INFERENCE_BACKEND
+COMPILED_CACHE_DIR = os.getenv("COMPILED_CACHE_DIR", "model_cache")
+
+
+class ModelStore:
+    """Loads each model, its scoring copy and its SHAP explainer once, on first use."""
+
+    def __init__(self, paths=MODEL_PATHS, backend=BACKEND, mmap=MODEL_MMAP):
+        self.paths = dict(paths)
+        self.backend = backend
+        self.mmap = mmap
+        self._models = {}
+        self._scorers = {}
+        self._explainers = {}
+        self._versions = {}
+        self.load_seconds = {}
+        self._lock = threading.RLock()
+
+    def model(self, name):
+        """The original fitted model (what SHAP needs)."""
+        if name not in self._models:
+            with self._lock:
+                if name not in self._models:
+                    import joblib
+                    start = time.perf_counter()
+                    self._models[name] = joblib.load(self.paths[name])
+                    self.load_seconds[f"{name}_model"] = time.perf_counter() - start
+        return self._models[name]
+
+    def scoring_model(self, name):
+        """What predict_proba runs on: the model itself, or its compiled copy."""
+        if name not in self._scorers:
+            with self._lock:
+                if name not in self._scorers:
+                    start = time.perf_counter()
+                    self._versions[name] = self._file_version(name)
+                    self._scorers[name] = self._load_scorer(name)
+                    self.load_seconds[f"{name}_scorer"] = time.perf_counter() - start
+        return self._scorers[name]
+
+    def explainer(self, name):
+        if name not in self._explainers:
+            with self._lock:
+                if name not in self._explainers:
+                    from explain import ModelExplainer
+                    start = time.perf_counter()
+                    self._explainers[name] = ModelExplainer(self.model(name))
+                    self.load_seconds[f"{name}_explainer"] = time.perf_counter() - start
+        return self._explainers[name]
+
+    def explainers(self):
+        """The explainers built so far (doesn't build any)."""
+        return dict(self._explainers)
+
+    def _load_scorer(self, name):
+        if self.backend != "compiled":
+            return self.model(name)
+
+        # Compiled forests are cached next to the model, keyed by the model file's
+        # size and mtime, so a retrained joblib is recompiled (and re-checked) automatically
+        st = os.stat(self.paths[name])
+        cache = os.path.join(COMPILED_CACHE_DIR, f"{name}-{st.st_size}-{st.st_mtime_ns}")
+        if os.path.exists(os.path.join(cache, "meta.json")):
+            return load_compiled(cache, mmap_mode="r" if self.mmap else None)
+
+        model = self.model(name)
+        compiled = compile_model(model)
+        error = max_parity_error(model, compiled, parity_sample(width=len(compiled.feature_names_in_)))
+        if error > PARITY_TOLERANCE:
+            print(f"Compiled {name} model off by {error:.2e}, using the original model")
+            return model
+        save_compiled(compiled, cache)
+        return load_compiled(cache, mmap_mode="r" if self.mmap else None)
+
+    def features(self, name):
+        """The columns model `name` scores on (loads it if needed)."""
+        return model_features(self.scoring_model(name))
+
+    def uses_velocity(self):
+        """True if any model here was trained on the velocity columns (loads them if needed)."""
+        return any(uses_velocity(self.features(name)) for name in self.paths)
+
+    def _file_version(self, name):
+        st = os.stat(self.paths[name])
+        return [st.st_size, st.st_mtime_ns]
+
+    def fingerprint(self):
+        """Identifies the model artifacts results are computed with: size + mtime of each
+        file as it was when loaded (files not loaded yet are read from disk as they are now)."""
+        versions = {name: self._versions.get(name) or self._file_version(name) for name in sorted(self.paths)}
+        return hashlib.sha256(json.dumps([self.backend, versions]).encode()).hexdigest()[:16]
+
+    def scorers(self):
+        """Lazy {"RF": ..., "XGB": ...} mapping for scoring.Scorer."""
+        return LazyScorers(self)
+
+    def warm(self, explainers=True):
+        """Load everything now: scoring models first, then the explainers."""
+        for name in self.paths:
+            self.scoring_model(name)
+        if explainers:
+            for name in self.paths:
+                self.explainer(name)
+
+    def ready(self):
+        return all(name in self._scorers for name in self.paths)
+
+    def shared_pages(self):
+        """Models whose scoring arrays are memory-mapped, i.e. shared between worker processes."""
+        return sorted(name for name, scorer in self._scorers.items()
+                      if self.mmap and isinstance(scorer, CompiledForest))
+
+    def status(self):
+        return {
+            "backend": self.backend,
+            "mmap": self.mmap,
+            "shared_pages": self.shared_pages(),
+            "models": sorted(self._models),
+            "scorers": sorted(self._scorers),
+            "explainers": sorted(self._explainers),
+            "features": {name: model_features(model) for name, model in self._scorers.items()},
+            "fingerprint": self.fingerprint(),
+            "load_seconds": {k: round(v, 4) for k, v in self.load_seconds.items()},
+        }
+
+
+class LazyScorers:
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, name):
+        return self.store.scoring_model(name)
+
+    def __contains__(self, name):
+        return name in self.store.paths
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Narratives depend only on the top-3 SHAP factors, so near-identical transactions
+# (impacts within NARRATIVE_QUANTUM of each other) share one Gemini reply.
+NARRATIVE_QUANTUM = float(os.getenv("NARRATIVE_QUANTUM", "0.1"))
+NARRATIVE_CACHE_SIZE = int(os.getenv("NARRATIVE_CACHE_SIZE", "1000"))
+NARRATIVE_TTL = float(os.getenv("NARRATIVE_TTL", "3600"))
+MAX_ANALYSES = int(os.getenv("MAX_ANALYSES", "10000"))
+
+
+def signature(top_factors, quantum=NARRATIVE_QUANTUM):
+    """Cache key: the top-3 (feature, impact) pairs with impacts snapped to a grid."""
+    return tuple(
+        (f["feature"], round(round(f["impact"] / quantum) * quantum, 6))
+        for f in top_factors[:3]
+    )
+
+
+class TTLCache:
+    """LRU cache where entries also expire after `ttl` seconds. Thread-safe."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and time.monotonic() - item[1] < self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class NarrativeService:
+    """Generates fraud narratives in the background and hands them out by analysis_id.
+
+    `generate_fn(signature)` is a coroutine returning the narrative text for a
+    cache signature. Concurrent requests with the same signature share one call.
+    """
+
+    def __init__(self, generate_fn, cache=None):
+        self.generate_fn = generate_fn
+        self.cache = cache or TTLCache(NARRATIVE_CACHE_SIZE, NARRATIVE_TTL)
+        self._analyses = OrderedDict()  # analysis_id -> entry dict
+        self._inflight = {}  # signature -> analysis_id
+        self._tasks = set()
+
+    def request(self, top_factors):
+        """Start (or reuse) a narrative for these factors. Returns the entry right away."""
+        sig = signature(top_factors)
+
+        cached = self.cache.get(sig)
+        if cached is not None:
+            return self._new_entry("done", cached, cached=True)
+
+        if sig in self._inflight and self._inflight[sig] in self._analyses:
+            return self._analyses[self._inflight[sig]]
+
+        entry = self._new_entry("pending", None)
+        self._inflight[sig] = entry["analysis_id"]
+        task = asyncio.get_running_loop().create_task(self._generate(sig, entry))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return entry
+
+    async def _generate(self, sig, entry):
+        try:
+            text = await self.generate_fn(sig)
+            self.cache.put(sig, text)
+            entry.update(status="done", ai_analysis=text)
+        except asyncio.TimeoutError:
+            entry.update(status="error", ai_analysis="AI Error: Gemini did not reply in time.")
+        except Exception as e:
+            entry.update(status="error", ai_analysis=f"AI Error: {str(e)}")
+        finally:
+            self._inflight.pop(sig, None)
+            entry["_event"].set()
+
+    def _new_entry(self, status, text, cached=False):
+        entry = {
+            "analysis_id": uuid.uuid4().hex,
+            "status": status,
+            "ai_analysis": text,
+            "cached": cached,
+            "_event": asyncio.Event(),
+        }
+        if status != "pending":
+            entry["_event"].set()
+        self._analyses[entry["analysis_id"]] = entry
+        while len(self._analyses) > MAX_ANALYSES:
+            self._analyses.popitem(last=False)
+        return entry
+
+    async def get(self, analysis_id, wait=0.0):
+        """Look up an analysis, optionally waiting up to `wait` seconds for it to finish."""
+        entry = self._analyses.get(analysis_id)
+        if entry is None:
+            return None
+        if wait > 0 and not entry["_event"].is_set():
+            try:
+                await asyncio.wait_for(entry["_event"].wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+        return public(entry)
+
+    def stats(self):
+        return {
+            "cache": self.cache.stats(),
+            "pending": len(self._inflight),
+            "tracked_analyses": len(self._analyses),
+        }
+
+
+def public(entry):
+    return {k: v for k, v in entry.items() if not k.startswith("_")}
@@ -0,0 +1,103 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+# Sampling profiler for one request at a time. Switched on at runtime (POST /profiler),
+# then any request sent with an "X-Profile: 1" header is sampled while it runs and the
+# result is kept under the id returned in its X-Profile-Id response header.
+# Output is collapsed stacks ("frame;frame;frame count"), which flamegraph.pl and
+# speedscope read directly.
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+PROFILES_KEPT = 20
+
+# Leaf frames of threads that are just parked (idle pool workers, the loop's selector)
+_IDLE = {"wait", "select", "poll", "epoll", "_worker", "acquire", "_wait_for_tstate_lock", "sleep"}
+
+
+class SamplingProfiler:
+    """Samples every thread's stack every `interval` seconds until stopped.
+
+    Requests hop between the event loop and the executor pools, so all threads
+    are sampled; parked ones are skipped.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own or frame.f_code.co_name in _IDLE:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if ident not in names:
+                    names[ident] = next((t.name for t in threading.enumerate() if t.ident == ident), str(ident))
+                self.stacks[";".join([names[ident], *reversed(stack)])] += 1
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """Runtime switch + the last PROFILES_KEPT request profiles."""
+
+    def __init__(self, enabled=PROFILER_ENABLED, keep=PROFILES_KEPT):
+        self.enabled = enabled
+        self.keep = keep
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+        self._active = threading.Lock()  # one profiled request at a time
+
+    def begin(self):
+        """A started profiler, or None if profiling is off or another request is being profiled."""
+        if not self.enabled or not self._active.acquire(blocking=False):
+            return None
+        return SamplingProfiler().start()
+
+    def finish(self, profiler, label):
+        profiler.stop()
+        self._active.release()
+        profile_id = uuid.uuid4().hex
+        with self._lock:
+            self._profiles[profile_id] = {
+                "label": label,
+                "seconds": round(profiler.seconds, 4),
+                "samples": profiler.samples,
+                "collapsed": profiler.collapsed(),
+            }
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id):
+        return self._profiles.get(profile_id)
+
+    def list(self):
+        return [{"profile_id": pid, "label": p["label"], "seconds": p["seconds"], "samples": p["samples"]}
+                for pid, p in reversed(self._profiles.items())]
@@ -0,0 +1,88 @@
+import json
+import os
+
+import numpy as np
+
+# Rule-based reason codes for flagged transactions. Rules are checked in order and the
+# first match wins; rows matching none get DEFAULT_REASON.
+# REASON_THRESHOLDS (JSON) overrides any of the thresholds below,
+# e.g. REASON_THRESHOLDS='{"drain_min_amount": 75000}'
+DEFAULT_THRESHOLDS = {
+    "drain_min_amount": 50000,         # Account Draining: amount above this...
+    "drain_max_balance": 1000,         # ...and sender left with less than this
+    "rapid_min_change": 100000,        # Rapid Transfer: sender balance moves by more than this
+    "recipient_min_change": 150000,    # Unusual Recipient: receiver balance moves by more than this
+    "structuring_min_amount": 10000,   # Structuring Pattern: amount strictly between these two,
+    "structuring_max_amount": 50000,   # with the sender balance going down
+}
+DEFAULT_REASON = "Anomalous Activity"
+
+
+def load_thresholds(overrides=None):
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    for key, value in (overrides or {}).items():
+        if key not in DEFAULT_THRESHOLDS:
+            raise ValueError(f"Unknown reason threshold: {key}")
+        thresholds[key] = float(value)
+    return thresholds
+
+
+THRESHOLDS = load_thresholds(json.loads(os.getenv("REASON_THRESHOLDS", "{}")))
+
+
+def generate_fraud_reason(row, thresholds=None):
+    """Generate a user-friendly fraud reason based on transaction patterns"""
+    t = thresholds or THRESHOLDS
+
+    # Check for account draining (high amount, low remaining balance)
+    if row.get('amount', 0) > t["drain_min_amount"]:
+        new_balance = row.get('newbalanceOrig', 0)
+        if new_balance < t["drain_max_balance"]:
+            return "Account Draining"
+
+    # Check for rapid transfers (high balance change)
+    balance_change = abs(row.get('newbalanceOrig', 0) - row.get('oldbalanceOrg', 0))
+    if balance_change > t["rapid_min_change"]:
+        return "Rapid Transfer"
+
+    # Check for unusual patterns (receiver balance spike)
+    dest_balance_change = abs(row.get('newbalanceDest', 0) - row.get('oldbalanceDest', 0))
+    if dest_balance_change > t["recipient_min_change"]:
+        return "Unusual Recipient"
+
+    # Check for structuring (multiple moderate transfers)
+    if t["structuring_min_amount"] < row.get('amount', 0) < t["structuring_max_amount"]:
+        if row.get('oldbalanceOrg', 0) > row.get('newbalanceOrig', 0):
+            return "Structuring Pattern"
+
+    # Default reason
+    return DEFAULT_REASON
+
+
+def reason_codes(frame, thresholds=None):
+    """Vectorized generate_fraud_reason: the same rules as column expressions.
+
+    `frame` is a DataFrame or a dict of equal-length arrays; missing columns count
+    as 0 like row.get(col, 0) does. Returns an object array of reason strings.
+    """
+    t = thresholds or THRESHOLDS
+    n = len(next(iter(frame.values()))) if isinstance(frame, dict) else len(frame)
+
+    def col(name):
+        if name not in frame:
+            return np.zeros(n)
+        return np.asarray(frame[name], dtype=np.float64)
+
+    amount = col('amount')
+    old_org, new_orig = col('oldbalanceOrg'), col('newbalanceOrig')
+    old_dest, new_dest = col('oldbalanceDest'), col('newbalanceDest')
+
+    # np.select takes the first true condition, which is the rules' priority order
+    conditions = [
+        (amount > t["drain_min_amount"]) & (new_orig < t["drain_max_balance"]),
+        np.abs(new_orig - old_org) > t["rapid_min_change"],
+        np.abs(new_dest - old_dest) > t["recipient_min_change"],
+        (amount > t["structuring_min_amount"]) & (amount < t["structuring_max_amount"]) & (old_org > new_orig),
+    ]
+    choices = ["Account Draining", "Rapid Transfer", "Unusual Recipient", "Structuring Pattern"]
+    return np.select(conditions, np.array(choices, dtype=object), default=DEFAULT_REASON)
@@ -0,0 +1,202 @@
+import io
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+
+from reasons import generate_fraud_reason
+
+# PDF audit reports, rendered in memory. Archival copies are optional:
+# REPORT_ARCHIVE_KEEP newest reports are kept in REPORTS_DIR (0 = keep none).
+REPORTS_DIR = os.getenv("REPORTS_DIR", "reports")
+REPORT_ARCHIVE_KEEP = int(os.getenv("REPORT_ARCHIVE_KEEP", "200"))
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", str(min(4, os.cpu_count() or 1))))
+MAX_TABLE_ROWS = 20
+
+# --- STATIC LAYOUT ---
+# Everything that doesn't depend on the scan is fixed here once: fonts, colours,
+# column widths and headers of both tables, footer text.
+TITLE = "FraudSentry Audit Report"
+FOOTER = "Generated by FraudSentry - Intelligent Fraud Detection System"
+CONFIRMED_TABLE = {
+    "title": "TABLE 1: CONFIRMED FRAUD TRANSACTIONS",
+    "colour": (220, 20, 20),  # red
+    "row_fill": (255, 240, 240),
+    "widths": (20, 20, 18, 22, 30),
+    "headers": ("Amount", "Sender Bal", "Risk", "Status", "Reason"),
+    "align": ("R", "R", "C", "C", "L"),
+}
+FALSE_ALARM_TABLE = {
+    "title": "TABLE 2: FALSE ALARM CANDIDATES (ANALYST REVIEWED)",
+    "colour": (245, 130, 0),  # orange
+    "row_fill": (255, 250, 240),
+    "widths": (20, 20, 18, 18, 34),
+    "headers": ("Amount", "Sender Bal", "Risk", "XGB", "Analyst Notes"),
+    "align": ("R", "R", "C", "C", "L"),
+}
+
+_executor = None
+
+
+@lru_cache(maxsize=8)
+def _date_line(day):
+    # e.g. "Thursday, 18 Dec 2025"; one strftime per day instead of per report
+    return datetime.strptime(day, "%Y-%m-%d").strftime("%A, %d %b %Y")
+
+
+def row_flag(row, model_type, thresholds):
+    """Fraud flag for a report row: re-derived from its risk score with the given threshold."""
+    score = row.get(f'{model_type}_Risk_Score')
+    if score is None:
+        return row.get(f'{model_type}_Prediction')
+    return int(score > thresholds.get(model_type, 0.5))
+
+
+def _table(pdf, layout, cells):
+    pdf.set_font("Arial", 'B', 12)
+    pdf.set_text_color(*layout["colour"])
+    pdf.cell(200, 10, txt=layout["title"], ln=True)
+
+    pdf.set_font("Arial", 'B', 8)
+    pdf.set_fill_color(*layout["colour"])
+    pdf.set_text_color(255, 255, 255)
+    for width, header in zip(layout["widths"], layout["headers"]):
+        pdf.cell(width, 7, txt=header, border=1, align='C', fill=True)
+    pdf.ln()
+
+    pdf.set_font("Arial", size=7)
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_fill_color(*layout["row_fill"])
+    for row in cells:
+        for width, align, text in zip(layout["widths"], layout["align"], row):
+            pdf.cell(width, 6, txt=text, border=1, fill=True, align=align)
+        pdf.ln()
+    pdf.ln(4)
+
+
+def render_report(report, timestamp, thresholds=None, day=None):
+    """Build the audit PDF for a report payload (dict) and return its bytes."""
+    from fpdf import FPDF
+    thresholds = thresholds or {}
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_left_margin(10)
+    pdf.set_right_margin(10)
+
+    # --- HEADER WITH DATE ---
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(190, 10, txt=TITLE, ln=True, align='C')
+    pdf.set_font("Arial", size=9)
+    pdf.cell(190, 6, txt=_date_line(day or datetime.now().strftime("%Y-%m-%d")), ln=True, align='C')
+    pdf.ln(3)
+
+    # --- SUMMARY BOX - COMPACT ---
+    pdf.set_font("Arial", 'B', 10)
+    pdf.set_fill_color(200, 220, 240)  # Light blue background
+    pdf.cell(190, 7, txt="SCAN SUMMARY", ln=True, align='L', fill=True, border=1)
+    pdf.set_font("Arial", size=9)
+    pdf.set_fill_color(245, 245, 245)  # Light gray background
+    confirmed = report["confirmed_frauds"]
+    pdf.cell(190, 6, txt=f"  Confirmed Frauds: {len(confirmed)}  |  Total Scanned: {report['total']}  |  File: {report['filename'][:25]}", ln=True, fill=True, border=1)
+    pdf.ln(4)
+
+    # --- TABLE 1: CONFIRMED FRAUDS ---
+    if confirmed:
+        _table(pdf, CONFIRMED_TABLE, [(
+            f"${row.get('amount', 0):.0f}",
+            f"${row.get('oldbalanceOrg', 0):.0f}",
+            f"{row.get('XGB_Risk_Score', 0):.2f}",
+            "HIGH PRIORITY" if row_flag(row, "RF", thresholds) == 1 else "WARNING",
+            (row.get('reason') or generate_fraud_reason(row))[:15],
+        ) for row in confirmed[:MAX_TABLE_ROWS]])
+
+    # --- TABLE 2: FALSE ALARMS ---
+    if report["false_alarms"]:
+        _table(pdf, FALSE_ALARM_TABLE, [(
+            f"${row.get('amount', 0):.0f}",
+            f"${row.get('oldbalanceOrg', 0):.0f}",
+            f"{row.get('XGB_Risk_Score', 0):.2f}",
+            "Yes" if row_flag(row, "XGB", thresholds) == 1 else "No",
+            "Reviewed & Cleared",
+        ) for row in report["false_alarms"][:MAX_TABLE_ROWS]])
+
+    # --- FOOTER ---
+    pdf.set_font("Arial", 'I', 8)
+    pdf.set_text_color(128, 128, 128)
+    pdf.ln(10)
+    pdf.cell(190, 6, txt=FOOTER, ln=True, align='C')
+    pdf.cell(190, 4, txt=f"Report ID: {timestamp}  |  Status: AUDIT REPORT", ln=True, align='C')
+
+    out = pdf.output(dest='S')
+    # PyFPDF returns a latin-1 str, fpdf2 returns bytes
+    return out.encode('latin-1') if isinstance(out, str) else bytes(out)
+
+
+def report_filename(timestamp):
+    return f"FraudSentry_Report_{timestamp}.pdf"
+
+
+def archive_report(pdf_bytes, filename, keep=REPORT_ARCHIVE_KEEP):
+    """Keep a copy in REPORTS_DIR, dropping the oldest beyond `keep`. No-op when keep is 0."""
+    if keep <= 0:
+        return None
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    path = os.path.join(REPORTS_DIR, filename)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(pdf_bytes)
+    os.replace(tmp, path)
+
+    reports = sorted((e for e in os.scandir(REPORTS_DIR) if e.name.endswith(".pdf")),
+                     key=lambda e: e.stat().st_mtime)
+    for entry in reports[:max(0, len(reports) - keep)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+    return path
+
+
+# --- BULK GENERATION ---
+def _render_item(item):
+    report, timestamp, thresholds = item
+    return report_filename(timestamp), render_report(report, timestamp, thresholds)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawn, like the job pool: the API process has threads running
+        _executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def render_many(reports, thresholds=None, timestamp=None):
+    """Render many report payloads across the worker processes.
+
+    Returns [(filename, pdf_bytes)] in input order.
+    """
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    items = [(report, f"{timestamp}_{i + 1:03d}", thresholds) for i, report in enumerate(reports)]
+    if len(items) <= 1 or REPORT_WORKERS <= 1:
+        return [_render_item(item) for item in items]
+    chunksize = max(1, len(items) // (REPORT_WORKERS * 4))
+    return list(_get_executor().map(_render_item, items, chunksize=chunksize))
+
+
+def zip_reports(rendered):
+    """Bundle [(filename, pdf_bytes)] into one zip (stored, PDFs are already compressed)."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_STORED) as zf:
+        for filename, pdf_bytes in rendered:
+            zf.writestr(filename, pdf_bytes)
+    return buf.getvalue()
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import pickle
+import queue
+import threading
+from collections import OrderedDict
+
+# Content-addressed cache for /predict and /upload-batch results.
+# Memory tier is an LRU bounded by bytes; the optional disk tier (RESULT_CACHE_DIR)
+# survives restarts and is shared by workers on the same box. Disk writes and pruning
+# happen on a background writer thread, so put() never touches the disk; async callers
+# use get_memory() inline and only send get() (the disk read) to a pool on a miss.
+RESULT_CACHE_MB = float(os.getenv("RESULT_CACHE_MB", "64"))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR")  # unset = memory only
+RESULT_CACHE_DISK_MAX_FILES = int(os.getenv("RESULT_CACHE_DISK_MAX_FILES", "10000"))
+RESULT_CACHE_DISK_QUEUE = 1000  # pending disk writes; beyond that new ones are dropped
+
+
+def content_key(*parts):
+    """sha256 over JSON-encoded parts (floats keep full precision via repr)."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(json.dumps(part, sort_keys=True, default=repr).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def hash_fileobj(f, block_size=1 << 20):
+    """sha256 of a file object's bytes, read in blocks; rewinds it afterwards."""
+    h = hashlib.sha256()
+    f.seek(0)
+    for block in iter(lambda: f.read(block_size), b""):
+        h.update(block)
+    f.seek(0)
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Byte-bounded LRU with an optional on-disk second tier. Thread-safe.
+
+    Entries are tagged with the model fingerprint they were computed with;
+    `set_fingerprint` drops the memory tier when the models change, and disk
+    entries from other fingerprints are treated as misses.
+    """
+
+    def __init__(self, name, max_bytes=RESULT_CACHE_MB * 1024 * 1024, disk_dir=RESULT_CACHE_DIR,
+                 disk_max_files=RESULT_CACHE_DISK_MAX_FILES):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.disk_dir = os.path.join(disk_dir, name) if disk_dir else None
+        self.disk_max_files = disk_max_files
+        self.fingerprint = None
+        self._data = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.disk_dropped = 0
+        self._disk_puts = 0
+        self._disk_queue = None
+        self._writer = None
+
+    def set_fingerprint(self, fingerprint):
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                if self.fingerprint is not None:
+                    self.invalidations += 1
+                self.fingerprint = fingerprint
+                self._data.clear()
+                self._bytes = 0
+
+    def get_memory(self, key):
+        """Memory tier only (never blocks on disk); None on a miss, which isn't counted."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return pickle.loads(item[0])
+        return None
+
+    def get(self, key):
+        """Memory, then disk. Reads the disk tier, so async code runs it on a pool."""
+        value = self.get_memory(key)
+        if value is not None:
+            return value
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._memory_put(key, pickle.dumps(value))
+        return value
+
+    def put(self, key, value):
+        blob = pickle.dumps(value)
+        self._memory_put(key, blob)
+        self._disk_put(key, blob)
+
+    def _memory_put(self, key, blob):
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (blob, len(blob))
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes:
+                _, (_, size) = self._data.popitem(last=False)
+                self._bytes -= size
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pkl")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                fingerprint, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return value if fingerprint == self.fingerprint else None
+
+    def _disk_put(self, key, blob):
+        if not self.disk_dir:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._disk_queue = queue.Queue(RESULT_CACHE_DISK_QUEUE)
+                self._writer = threading.Thread(target=self._write_disk, name=f"cache-{self.name}", daemon=True)
+                self._writer.start()
+        try:
+            self._disk_queue.put_nowait((key, self.fingerprint, blob))
+        except queue.Full:
+            self.disk_dropped += 1
+
+    def _write_disk(self):
+        while True:
+            key, fingerprint, blob = self._disk_queue.get()
+            try:
+                path = self._disk_path(key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    pickle.dump((fingerprint, pickle.loads(blob)), f)
+                os.replace(tmp, path)
+                self._disk_puts += 1
+                if self._disk_puts % 100 == 0:
+                    self._prune_disk()
+            except OSError:
+                pass  # a lost disk entry is just a future miss
+            finally:
+                self._disk_queue.task_done()
+
+    def flush(self):
+        """Wait until queued disk writes are done (for scripts and shutdown)."""
+        if self._disk_queue is not None:
+            self._disk_queue.join()
+
+    def _prune_disk(self):
+        # Checked every 100 writes: when over the file limit, drop the oldest tenth
+        files = [os.path.join(root, name) for root, _, names in os.walk(self.disk_dir) for name in names]
+        if len(files) <= self.disk_max_files:
+            return
+        files.sort(key=lambda p: os.path.getmtime(p))
+        for path in files[:max(1, len(files) // 10)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_bytes": int(self.max_bytes),
+            "disk_tier": self.disk_dir is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "disk_pending": self._disk_queue.qsize() if self._disk_queue is not None else 0,
+            "disk_dropped": self.disk_dropped,
+        }
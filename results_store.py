@@ -0,0 +1,219 @@
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+
+from reasons import reason_codes
+from scoring import FEATURE_COLS
+
+# Per-row scores of every persisted scan, one directory per scan:
+#   results_store/<history_id>/<column>.bin  raw little-endian column, memory-mapped on read
+#   results_store/<history_id>/meta.json     row count, dtypes, thresholds used at scan time
+# Scans scored by /upload-batch?persist=true wait under pending-<scan_id> until
+# /save-report gives them a history id.
+RESULTS_DIR = os.getenv("RESULTS_DIR", "results_store")
+PENDING_TTL = float(os.getenv("RESULTS_PENDING_TTL", "86400"))
+
+COLUMNS = {
+    **{col: "<f8" for col in FEATURE_COLS},
+    "RF_Prediction": "i1",
+    "RF_Risk_Score": "<f8",  # mean of per-tree fractions, keep full precision
+    "XGB_Prediction": "i1",
+    "XGB_Risk_Score": "<f4",  # XGBoost scores in float32 anyway
+}
+SORT_KEYS = ("xgb", "rf", "max", "mean", "row")
+
+
+class ResultsWriter:
+    """Appends scored chunks column by column; nothing is kept in memory between chunks."""
+
+    def __init__(self, thresholds=None):
+        self.scan_id = uuid.uuid4().hex
+        self.path = os.path.join(RESULTS_DIR, f"pending-{self.scan_id}")
+        os.makedirs(self.path)
+        self.rows = 0
+        self.thresholds = dict(thresholds or {})
+        self._files = {col: open(os.path.join(self.path, f"{col}.bin"), "wb") for col in COLUMNS}
+
+    def append(self, df):
+        for col, dtype in COLUMNS.items():
+            self._files[col].write(np.ascontiguousarray(df[col].to_numpy(), dtype=dtype).tobytes())
+        self.rows += len(df)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        meta = {"scan_id": self.scan_id, "rows": self.rows, "columns": COLUMNS, "thresholds": self.thresholds, "created": time.time()}
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        return self.scan_id
+
+    def abort(self):
+        for f in self._files.values():
+            f.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def _scan_path(history_id):
+    return os.path.join(RESULTS_DIR, str(int(history_id)))
+
+
+def link_to_history(scan_id, history_id):
+    """Give a pending scan its history id. Returns False if the scan isn't there (expired/unknown)."""
+    pending = os.path.join(RESULTS_DIR, f"pending-{uuid.UUID(hex=scan_id).hex}")
+    if not os.path.exists(os.path.join(pending, "meta.json")):
+        return False
+    os.replace(pending, _scan_path(history_id))
+    # Leave a forwarding note so clone_scan can still find it by scan id
+    with open(f"{pending}.link", "w") as f:
+        f.write(str(int(history_id)))
+    return True
+
+
+def clone_scan(scan_id):
+    """New pending scan with the same rows as `scan_id` (pending or already saved).
+
+    Column files are never modified after close, so they are hard-linked where the
+    filesystem allows it. Returns the new scan id, or None if the source is gone.
+    """
+    source = os.path.join(RESULTS_DIR, f"pending-{uuid.UUID(hex=scan_id).hex}")
+    if not os.path.exists(os.path.join(source, "meta.json")):
+        try:
+            with open(f"{source}.link") as f:
+                source = _scan_path(f.read().strip())
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(os.path.join(source, "meta.json")):
+            return None
+
+    new_id = uuid.uuid4().hex
+    target = os.path.join(RESULTS_DIR, f"pending-{new_id}")
+
+    def link_or_copy(src, dst):
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+    shutil.copytree(source, target, copy_function=link_or_copy, ignore=shutil.ignore_patterns("meta.json"))
+    with open(os.path.join(source, "meta.json")) as f:
+        meta = json.load(f)
+    meta.update(scan_id=new_id, created=time.time())
+    with open(os.path.join(target, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return new_id
+
+
+def store_for_history(writer, history_id):
+    """Close a writer and file it straight under a history id (batch jobs)."""
+    writer.close()
+    os.replace(writer.path, _scan_path(history_id))
+
+
+def prune_pending(max_age=PENDING_TTL):
+    """Drop pending scans that were never saved as a report."""
+    if not os.path.isdir(RESULTS_DIR):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(RESULTS_DIR):
+        path = os.path.join(RESULTS_DIR, name)
+        if name.startswith("pending-") and os.path.getmtime(path) < cutoff:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)  # forwarding note of a saved scan
+
+
+class StoredScan:
+    """Read-only, memory-mapped view of one stored scan. Only touched columns are paged in."""
+
+    def __init__(self, history_id):
+        self.path = _scan_path(history_id)
+        with open(os.path.join(self.path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.rows = self.meta["rows"]
+        self._columns = {}
+
+    @classmethod
+    def exists(cls, history_id):
+        return os.path.exists(os.path.join(_scan_path(history_id), "meta.json"))
+
+    def column(self, name):
+        if name not in self._columns:
+            if self.rows == 0:
+                self._columns[name] = np.zeros(0, dtype=COLUMNS[name])
+            else:
+                self._columns[name] = np.memmap(os.path.join(self.path, f"{name}.bin"),
+                                                dtype=COLUMNS[name], mode="r", shape=(self.rows,))
+        return self._columns[name]
+
+    def ranking_score(self, sort):
+        if sort == "xgb":
+            return self.column("XGB_Risk_Score")
+        if sort == "rf":
+            return self.column("RF_Risk_Score")
+        rf = self.column("RF_Risk_Score").astype(np.float64)
+        xgb = self.column("XGB_Risk_Score").astype(np.float64)
+        return np.maximum(rf, xgb) if sort == "max" else (rf + xgb) / 2
+
+    def query(self, offset=0, limit=100, sort="xgb", min_score=None, max_score=None, score="xgb"):
+        """Page through rows filtered by a score range and ranked by `sort` (highest first).
+
+        `score` ("xgb"/"rf"/"max"/"mean") is the score min_score/max_score apply to.
+        Returns (matching_row_count, rows).
+        """
+        if sort not in SORT_KEYS or score not in SORT_KEYS[:-1]:
+            raise ValueError(f"sort must be one of {list(SORT_KEYS)} and score one of {list(SORT_KEYS[:-1])}")
+
+        idx = np.arange(self.rows)
+        if min_score is not None or max_score is not None:
+            values = self.ranking_score(score)
+            mask = np.ones(self.rows, dtype=bool)
+            if min_score is not None:
+                mask &= values >= min_score
+            if max_score is not None:
+                mask &= values <= max_score
+            idx = idx[mask]
+        total = len(idx)
+
+        if sort != "row" and len(idx):
+            keys = -np.asarray(self.ranking_score(sort))[idx]
+            end = offset + limit
+            if end < len(idx):
+                # Only rows up to the end of this page need ordering (ties included, so pages are stable)
+                kth = np.partition(keys, end - 1)[end - 1]
+                part = np.nonzero(keys <= kth)[0]
+                idx = idx[part[np.lexsort((idx[part], keys[part]))]]
+            else:
+                idx = idx[np.lexsort((idx, keys))]
+
+        page = idx[offset:offset + limit]
+        rows = []
+        for i in page:
+            row = {"row_num": int(i)}
+            for col, dtype in COLUMNS.items():
+                value = self.column(col)[i]
+                row[col] = int(value) if dtype == "i1" else float(value)
+            rows.append(row)
+        # Reason codes aren't stored, they follow from the features
+        codes = reason_codes({col: [row[col] for row in rows] for col in FEATURE_COLS}) if rows else []
+        for row, reason in zip(rows, codes):
+            row["reason"] = reason
+        return total, rows
+
+    def summary(self, thresholds=None):
+        """Flag counts, re-derived from the stored probabilities with `thresholds`
+        (defaults to the ones used when the scan was scored). No model is run."""
+        thresholds = {**{"RF": 0.5, "XGB": 0.5}, **self.meta.get("thresholds", {}), **(thresholds or {})}
+        rf = self.column("RF_Risk_Score") > thresholds["RF"]
+        xgb = self.column("XGB_Risk_Score") > thresholds["XGB"]
+        return {
+            "total_scanned": self.rows,
+            "rf_flags": int(rf.sum()),
+            "xgb_flags": int(xgb.sum()),
+            "both_agreed": int((rf & xgb).sum()),
+            "thresholds": thresholds,
+        }
@@ -0,0 +1,113 @@
+import os
+import time
+
+import numpy as np
+
+from metrics import MODEL_SECONDS, timed
+from velocity import VELOCITY_COLS
+
+FEATURE_COLS = ['amount', 'oldbalanceOrg', 'newbalanceOrig', 'oldbalanceDest', 'newbalanceDest']
+# Every column a served model can be trained on: the balance features, then the
+# per-account velocity features (velocity.py, TRAIN_VELOCITY=1). Each model scores on
+# its own columns, picked by name; plain matrices carry FEATURE_COLS or SERVING_COLS.
+SERVING_COLS = FEATURE_COLS + VELOCITY_COLS
+MODEL_TYPES = ("RF", "XGB")
+
+# A transaction is flagged when P(fraud) > threshold. 0.5 matches model.predict,
+# so the defaults change nothing; ops can move them without retraining.
+DEFAULT_THRESHOLDS = {
+    "RF": float(os.getenv("RF_THRESHOLD", "0.5")),
+    "XGB": float(os.getenv("XGB_THRESHOLD", "0.5")),
+}
+
+
+def model_features(model):
+    """The columns a fitted model (or compiled forest) scores on; FEATURE_COLS if it doesn't say."""
+    names = getattr(model, "feature_names_in_", None)
+    if names is None and hasattr(model, "get_booster"):
+        names = model.get_booster().feature_names
+    return FEATURE_COLS if names is None else [str(name) for name in names]
+
+
+def uses_velocity(features):
+    """True if a model with these columns needs the velocity store's output."""
+    return any(col in VELOCITY_COLS for col in features)
+
+
+def feature_frame(X):
+    """DataFrame for a feature matrix laid out as FEATURE_COLS or SERVING_COLS."""
+    import pandas as pd
+    X = np.asarray(X, dtype=np.float64)
+    X = X.reshape(1, -1) if X.ndim == 1 else X
+    if X.shape[1] == len(SERVING_COLS):
+        return pd.DataFrame(X, columns=SERVING_COLS)
+    return pd.DataFrame(X.reshape(-1, len(FEATURE_COLS)), columns=FEATURE_COLS)
+
+
+class Scorer:
+    """Shared scoring layer: one predict_proba pass per model, labels from per-model thresholds.
+
+    `models` maps "RF"/"XGB" to anything with an sklearn-style predict_proba
+    (the original models or their compiled copies); each gets the columns it was
+    trained on. `shadow(model_type, X, probs, seconds, threshold)`, if given, sees
+    every scored batch with all its columns (model_registry uses it to sample traffic
+    for shadow versions) and must not block.
+    """
+
+    def __init__(self, models, thresholds=None, shadow=None):
+        self.models = models
+        self.shadow = shadow
+        self.thresholds = dict(DEFAULT_THRESHOLDS)
+        if thresholds:
+            self.set_thresholds(thresholds)
+
+    def set_thresholds(self, thresholds):
+        for model_type, value in thresholds.items():
+            if model_type not in MODEL_TYPES:
+                raise ValueError(f"Unknown model type: {model_type}")
+            if not 0.0 <= value <= 1.0:
+                raise ValueError("Thresholds must be between 0 and 1")
+        self.thresholds.update({k: float(v) for k, v in thresholds.items()})
+
+    def probabilities(self, model_type, X):
+        """P(fraud) for every row of X, in a single pass over the ensemble."""
+        import pandas as pd
+        model = self.models[model_type]
+        with timed(MODEL_SECONDS, model_type=model_type, stage="frame"):
+            frame = X if isinstance(X, pd.DataFrame) else feature_frame(X)
+            X = frame[model_features(model)]
+        with timed(MODEL_SECONDS, model_type=model_type, stage="predict_proba"):
+            start = time.perf_counter()
+            probs = model.predict_proba(X)[:, 1]
+        if self.shadow is not None:
+            # Every feature column, copied (the caller's frame keeps changing): a shadow
+            # version may be trained on different ones
+            columns = [col for col in SERVING_COLS if col in frame.columns]
+            self.shadow(model_type, X if columns == list(X.columns) else frame[columns], probs,
+                        time.perf_counter() - start, self.thresholds[model_type])
+        return probs
+
+    def label(self, model_type, probs):
+        """0/1 fraud labels for probabilities (works on arrays and single floats)."""
+        flags = np.asarray(probs) > self.thresholds[model_type]
+        return flags.astype(np.int64) if flags.ndim else int(flags)
+
+    def score(self, model_type, X):
+        """(labels, probabilities) for X with one model."""
+        probs = self.probabilities(model_type, X)
+        return self.label(model_type, probs), probs
+
+    def score_frame(self, df):
+        """Add RF/XGB prediction and risk-score columns to df, in place."""
+        for model_type in MODEL_TYPES:
+            preds, probs = self.score(model_type, df)
+            df[f'{model_type}_Prediction'] = preds
+            df[f'{model_type}_Risk_Score'] = probs
+        return df
+
+
+def flag_agreement(first, second):
+    """(first_flags, second_flags, both_flagged) for two aligned arrays of 0/1 labels."""
+    first = np.asarray(first) == 1
+    second = np.asarray(second) == 1
+    return int(first.sum()), int(second.sum()), int((first & second).sum())
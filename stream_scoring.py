@@ -0,0 +1,251 @@
+import asyncio
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+import metrics
+from reasons import reason_codes
+from scoring import FEATURE_COLS, MODEL_TYPES
+from velocity import VELOCITY_COLS, event_time
+
+# Continuous scoring of a newline-delimited JSON stream of transactions.
+# Records are parsed into a bounded buffer; when STREAM_BUFFER_ROWS are waiting the
+# reader stops pulling from the connection, so a fast producer is slowed down by TCP
+# instead of growing server memory. The scorer takes everything that is waiting (up to
+# STREAM_MAX_BATCH) as one batch: single rows when the feed is quiet, big matrices when
+# it is busy. Results come back in input order, one JSON line per record.
+STREAM_BUFFER_ROWS = int(os.getenv("STREAM_BUFFER_ROWS", "10000"))
+STREAM_MAX_BATCH = int(os.getenv("STREAM_MAX_BATCH", "2048"))
+STREAM_OUT_BATCHES = int(os.getenv("STREAM_OUT_BATCHES", "8"))  # scored batches waiting to be sent
+STREAM_MAX_LINE = 64 * 1024
+
+_END = object()
+
+
+class _Failed:
+    """Put in the outbox by a scorer that can't go on; ends the stream with an error line."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+async def ndjson_lines(chunks, max_line=STREAM_MAX_LINE):
+    """Split an async iterator of byte/str chunks into lines (without the newline)."""
+    pending = b""
+    async for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+        if len(pending) > max_line:
+            raise ValueError(f"NDJSON line longer than {max_line} bytes")
+    if pending:
+        yield pending
+
+
+def parse_record(line):
+    """(record_id, features, account) for one NDJSON line. Raises ValueError for bad records.
+
+    `account` is (nameOrig, nameDest, event time or None) when the record names its sender, else None.
+    """
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e.msg}")
+    if not isinstance(record, dict):
+        raise ValueError("Each line must be a JSON object")
+    try:
+        features = [float(record[col]) for col in FEATURE_COLS]
+    except KeyError as e:
+        raise ValueError(f"Missing field: {e.args[0]}")
+    except (TypeError, ValueError):
+        raise ValueError(f"Fields {FEATURE_COLS} must be numbers")
+    if not all(map(math.isfinite, features)):
+        raise ValueError(f"Fields {FEATURE_COLS} must be finite numbers")  # 1e999 parses as inf
+    account = None
+    if record.get("nameOrig") is not None:
+        try:
+            account = (str(record["nameOrig"]), None if record.get("nameDest") is None else str(record["nameDest"]),
+                       event_time(record.get("timestamp"), record.get("step")))
+        except (TypeError, ValueError):
+            raise ValueError("Fields timestamp / step must be numbers")
+    return record.get("id"), features, account
+
+
+class StreamScorer:
+    """Scores one stream of NDJSON lines with both models of a scoring.Scorer.
+
+    `score_batch` runs on `executor`; everything else stays on the event loop. With a
+    velocity.VelocityStore, records that name their sender update it and every row gets
+    the velocity columns (zeros for records that don't), for models trained on them.
+    """
+
+    def __init__(self, scorer, executor=None, reasons=True, max_batch=STREAM_MAX_BATCH,
+                 buffer_rows=STREAM_BUFFER_ROWS, out_batches=STREAM_OUT_BATCHES, endpoint="/stream",
+                 velocity=None):
+        self.scorer = scorer
+        self.executor = executor
+        self.velocity = velocity
+        self.reasons = reasons
+        self.max_batch = max_batch
+        self.buffer_rows = buffer_rows
+        self.out_batches = out_batches
+        self.endpoint = endpoint
+        self.records = 0
+        self.batches = 0
+        self.max_buffered = 0
+
+    def score_batch(self, X, accounts=None):
+        """Both models' probabilities (+ reason codes) for a feature matrix."""
+        if self.velocity is not None:
+            history = np.zeros((len(X), len(VELOCITY_COLS)))
+            named = [i for i, account in enumerate(accounts or []) if account is not None]
+            if named:
+                now = time.time()
+                times = [now if accounts[i][2] is None else accounts[i][2] for i in named]
+                history[named] = self.velocity.observe_many([accounts[i][0] for i in named],
+                                                            [accounts[i][1] for i in named], times,
+                                                            X[named, FEATURE_COLS.index("amount")])
+            X = np.hstack([X, history])
+        probs = {model_type: self.scorer.probabilities(model_type, X) for model_type in MODEL_TYPES}
+        reasons = reason_codes(dict(zip(FEATURE_COLS, X.T))) if self.reasons else None
+        return probs, reasons
+
+    async def results(self, lines):
+        """Async iterator of NDJSON result chunks (one chunk per scored batch), in input order."""
+        inbox = asyncio.Queue(self.buffer_rows)
+        outbox = asyncio.Queue(self.out_batches)
+        reader = asyncio.ensure_future(self._read(lines, inbox))
+        worker = asyncio.ensure_future(self._score(inbox, outbox))
+        failed = False
+        try:
+            while True:
+                chunk = await self._next(outbox, worker)
+                if chunk is _END:
+                    break
+                if isinstance(chunk, _Failed):
+                    # The reader may be parked on a full inbox nobody drains any more: don't wait for it
+                    failed = True
+                    yield json.dumps({"error": chunk.error}) + "\n"
+                    break
+                lines_out, enqueued = chunk
+                yield lines_out
+                now = time.perf_counter()
+                hist = metrics.STAGE_SECONDS.labels(endpoint=self.endpoint, stage="end_to_end")
+                for t in enqueued:
+                    hist.observe(now - t)
+            if not failed:
+                await reader  # re-raises a read error (e.g. an oversized line)
+        finally:
+            reader.cancel()
+            worker.cancel()
+
+    @staticmethod
+    async def _next(outbox, worker):
+        """Next outbox item, or a _Failed if the scoring task ended without saying so."""
+        get = asyncio.ensure_future(outbox.get())
+        done, _ = await asyncio.wait({get, worker}, return_when=asyncio.FIRST_COMPLETED)
+        if get in done:
+            return get.result()
+        get.cancel()  # a cancelled Queue.get leaves its item in the queue
+        try:
+            await get
+        except asyncio.CancelledError:
+            pass
+        if not outbox.empty():
+            return outbox.get_nowait()
+        error = worker.exception() if not worker.cancelled() else None
+        return _Failed(f"Scoring stopped: {error or 'cancelled'}")
+
+    async def _read(self, lines, inbox):
+        seq = 0
+        try:
+            async for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record_id, features, account = parse_record(line)
+                    item = (seq, record_id, features, None, time.perf_counter(), account)
+                except ValueError as e:
+                    item = (seq, None, None, str(e), time.perf_counter(), None)
+                await inbox.put(item)  # blocks while the buffer is full: that's the backpressure
+                self.max_buffered = max(self.max_buffered, inbox.qsize())
+                seq += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            await inbox.put(_END)  # let the scorer finish what was read, then fail the stream
+            raise
+        await inbox.put(_END)
+
+    async def _score(self, inbox, outbox):
+        try:
+            await self._score_batches(inbox, outbox)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await outbox.put(_Failed(f"Scoring failed: {e}"))
+        await outbox.put(_END)
+
+    async def _score_batches(self, inbox, outbox):
+        loop = asyncio.get_running_loop()
+        done = False
+        while not done:
+            # 1. Block for the first record, then take whatever else is already waiting
+            batch = [await inbox.get()]
+            if batch[0] is _END:
+                break
+            while len(batch) < self.max_batch and not inbox.empty():
+                item = inbox.get_nowait()
+                if item is _END:
+                    done = True
+                    break
+                batch.append(item)
+
+            # 2. One matrix per batch, both models
+            valid = [item for item in batch if item[3] is None]
+            probs = reasons = None
+            if valid:
+                X = np.array([item[2] for item in valid], dtype=np.float64)
+                accounts = [item[5] for item in valid]
+                with metrics.stage(self.endpoint, "score"):
+                    probs, reasons = await loop.run_in_executor(self.executor, self.score_batch, X, accounts)
+                for model_type in MODEL_TYPES:
+                    flags = int((self.scorer.label(model_type, probs[model_type]) == 1).sum())
+                    metrics.ROWS_SCORED.labels(endpoint=self.endpoint, model_type=model_type).inc(len(valid))
+                    metrics.FRAUD_FLAGS.labels(endpoint=self.endpoint, model_type=model_type).inc(flags)
+
+            # 3. Results in input order (errors keep their place)
+            out, i = [], 0
+            for seq, record_id, _, error, _, _ in batch:
+                result = {"seq": seq}
+                if record_id is not None:
+                    result["id"] = record_id
+                if error is not None:
+                    result["error"] = error
+                else:
+                    for model_type in MODEL_TYPES:
+                        p = float(probs[model_type][i])
+                        result[f"{model_type}_Risk_Score"] = p
+                        result[f"{model_type}_Prediction"] = self.scorer.label(model_type, p)
+                    if reasons is not None:
+                        result["reason"] = reasons[i]
+                    i += 1
+                out.append(json.dumps(result))
+            self.records += len(batch)
+            self.batches += 1
+            await outbox.put(("\n".join(out) + "\n", [item[4] for item in batch]))
+
+    def stats(self):
+        return {
+            "records": self.records,
+            "batches": self.batches,
+            "mean_batch": self.records / self.batches if self.batches else 0.0,
+            "max_buffered": self.max_buffered,
+        }
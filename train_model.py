@@ -1,34 +1,36 @@
-import pandas as pd
-from sklearn.model_selection import train_test_split
+import os
+from data_prep import load as load_prepared
+from scoring import FEATURE_COLS
+from velocity import VELOCITY_COLS
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, confusion_matrix
 import joblib
 
 # 1. LOAD THE DATA
-# We use Pandas to read the big CSV file.
-print("Loading dataset... this might take a few seconds.")
-# Make sure the filename matches exactly what is in your dataset folder!
-df = pd.read_csv('dataset/datasetkaggle.csv')
-
-# 2. PRE-PROCESSING (Cleaning)
-# We need to filter the data. In PaySim, fraud only happens in 'TRANSFER' and 'CASH_OUT'.
-# We drop other types to make the model sharper and faster.
-print("Filtering data...")
-df = df[df['type'].isin(['TRANSFER', 'CASH_OUT'])]
-
-# The model only understands numbers, not words like 'PAYMENT'.
-# So we drop columns that are text or IDs (like nameOrig) because they confuse the model.
+# The big CSV is converted once into a compact binary cache (see data_prep.py):
+# only TRANSFER / CASH_OUT rows, only the columns we use, float32.
+# In PaySim, fraud only happens in 'TRANSFER' and 'CASH_OUT', so the other types are dropped there.
 # We are keeping: amount, oldbalanceOrg, newbalanceOrig, oldbalanceDest, newbalanceDest
-X = df[['amount', 'oldbalanceOrg', 'newbalanceOrig', 'oldbalanceDest', 'newbalanceDest']]
-y = df['isFraud']  # This is the "Answer Key" (0 = Legit, 1 = Fraud)
+# TRAIN_VELOCITY=1 also feeds the per-account velocity columns (velocity.py) to the model
+# and saves it as fraud_model_velocity.joblib, next to the 5-feature model. Deploy it with
+# POST /models/deploy; the API then computes the velocity columns for it.
+VELOCITY = os.getenv("TRAIN_VELOCITY", "0") == "1"
+COLUMNS = FEATURE_COLS + VELOCITY_COLS if VELOCITY else FEATURE_COLS
+OUTPUT = 'fraud_model_velocity.joblib' if VELOCITY else 'fraud_model.joblib'
 
-# 3. SPLITTING THE DATA
+print("Loading dataset...")
+data = load_prepared()
+
+# 2. SPLITTING THE DATA
 # We split the data: 80% for the model to study (Train), 20% for the 'Exam' (Test).
-# stratify=y ensures we have a fair mix of fraud cases in both sets.
+# The split is stratified (a fair mix of fraud cases in both sets) and shared with
+# train_xgboost.py and bench_models.py, so every model is graded on the same exam.
 print("Splitting data into Training and Testing sets...")
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+train_idx, test_idx = data.split()
+X_train, y_train = data.frame(train_idx, COLUMNS), data.y[train_idx]
+X_test, y_test = data.frame(test_idx, COLUMNS), data.y[test_idx]
 
-# 4. TRAINING THE MODEL (The Learning Phase)
+# 3. TRAINING THE MODEL (The Learning Phase)
 # We create the Random Forest.
 # class_weight='balanced' is CRUCIAL. It tells the model:
 # "Pay extra attention to Fraud (1) because it is rare!"
@@ -36,7 +38,7 @@ print("Training the Random Forest model... (Go grab a coffee, this takes a minut
 model = RandomForestClassifier(n_estimators=100, class_weight='balanced', random_state=42, n_jobs=-1)
 model.fit(X_train, y_train)
 
-# 5. EVALUATION (The Exam Results)
+# 4. EVALUATION (The Exam Results)
 print("Evaluating model performance...")
 predictions = model.predict(X_test)
 
@@ -44,10 +46,10 @@ predictions = model.predict(X_test)
 print("\n--- Model Performance Report ---")
 print(classification_report(y_test, predictions))
 
-# 6. SAVE THE BRAIN
+# 5. SAVE THE BRAIN
 # We save the trained model into a file so your Web App can use it later.
-joblib.dump(model, 'fraud_model.joblib')
-print("Model saved as 'fraud_model.joblib'!")
+joblib.dump(model, OUTPUT)
+print(f"Model saved as '{OUTPUT}'!")
 
 # Add this at the bottom of your script
 print("\n--- Confusion Matrix (The Exact Counts) ---")
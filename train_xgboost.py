@@ -1,18 +1,28 @@
-import pandas as pd
-from sklearn.model_selection import train_test_split
+import os
+import tempfile
+import numpy as np
+import xgboost as xgb
 from xgboost import XGBClassifier
 from sklearn.metrics import classification_report, confusion_matrix
 import joblib
+from data_prep import load as load_prepared, xgb_batches
+from scoring import FEATURE_COLS
+from velocity import VELOCITY_COLS
 
-# 1. LOAD AND PREP (Same as before)
-print("Loading dataset...")
-df = pd.read_csv('dataset/datasetkaggle.csv')
-
-print("Filtering data...")
-df = df[df['type'].isin(['TRANSFER', 'CASH_OUT'])]
+# XGB_EXTERNAL_MEMORY=1 keeps the quantised training matrix on disk instead of in RAM;
+# XGB_BATCH_ROWS is how many rows are read from the cache at a time.
+EXTERNAL_MEMORY = os.getenv("XGB_EXTERNAL_MEMORY", "0") == "1"
+BATCH_ROWS = int(os.getenv("XGB_BATCH_ROWS", "500000"))
+# TRAIN_VELOCITY=1 adds the per-account velocity columns and saves fraud_model_xgboost_velocity.joblib
+# (deployable through POST /models/deploy, like the 5-feature model)
+VELOCITY = os.getenv("TRAIN_VELOCITY", "0") == "1"
+COLUMNS = FEATURE_COLS + VELOCITY_COLS if VELOCITY else FEATURE_COLS
+OUTPUT = 'fraud_model_xgboost_velocity.joblib' if VELOCITY else 'fraud_model_xgboost.joblib'
 
-X = df[['amount', 'oldbalanceOrg', 'newbalanceOrig', 'oldbalanceDest', 'newbalanceDest']]
-y = df['isFraud']
+# 1. LOAD AND PREP (Same as before: the shared binary cache, see data_prep.py)
+print("Loading dataset...")
+data = load_prepared()
+y = np.asarray(data.y)
 
 # 2. CALCULATE THE WEIGHT
 # XGBoost doesn't automatically handle imbalance like Random Forest's "class_weight='balanced'".
@@ -24,22 +34,38 @@ ratio = count_legit / count_fraud
 print(f"Legit/Fraud Ratio: {ratio:.2f}") 
 # This tells the model: "Every 1 fraud is as important as X legit transactions."
 
-# 3. SPLIT
+# 3. SPLIT (the same stratified 80/20 split as train_model.py)
 print("Splitting data...")
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+train_idx, test_idx = data.split()
+X_test, y_test = data.frame(test_idx, COLUMNS), y[test_idx]
 
 # 4. TRAIN XGBOOST
 print("Training XGBoost... (This is usually faster than Random Forest)")
+# The training rows are streamed from the cache in batches and quantised as they arrive
+# (~1 byte per value instead of 8), so the float matrix is never held in memory at once.
 # scale_pos_weight=ratio is the Magic Sauce here.
-model = XGBClassifier(
-    scale_pos_weight=ratio, 
-    n_estimators=100, 
-    max_depth=6, 
-    learning_rate=0.1, 
-    random_state=42,
-    n_jobs=-1
-)
-model.fit(X_train, y_train)
+params = {
+    "objective": "binary:logistic",
+    "tree_method": "hist",
+    "scale_pos_weight": ratio,
+    "max_depth": 6,
+    "learning_rate": 0.1,
+    "seed": 42,
+    "nthread": os.cpu_count(),
+}
+with tempfile.TemporaryDirectory() as cache_dir:
+    if EXTERNAL_MEMORY:
+        batches = xgb_batches(data, train_idx, BATCH_ROWS, cache_prefix=os.path.join(cache_dir, "xgb"),
+                              columns=COLUMNS)
+        dtrain = xgb.ExtMemQuantileDMatrix(batches, max_bin=256)
+    else:
+        dtrain = xgb.QuantileDMatrix(xgb_batches(data, train_idx, BATCH_ROWS, columns=COLUMNS), max_bin=256)
+    booster = xgb.train(params, dtrain, num_boost_round=100)
+    del dtrain
+
+# Wrap the booster in the sklearn classifier the API loads
+model = XGBClassifier()
+model.load_model(booster.save_raw("ubj"))
 
 # 5. EVALUATE
 print("Evaluating model...")
@@ -56,5 +82,5 @@ print(f"Fraud Transactions Missed (DANGER):  {cm[1][0]}")
 print(f"Fraud Transactions Caught (SUCCESS): {cm[1][1]}")
 
 # 6. SAVE
-joblib.dump(model, 'fraud_model_xgboost.joblib')
-print("Model saved as 'fraud_model_xgboost.joblib'!")
\ No newline at end of file
+joblib.dump(model, OUTPUT)
+print(f"Model saved as '{OUTPUT}'!")
\ No newline at end of file
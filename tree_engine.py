@@ -0,0 +1,225 @@
+import json
+import os
+
+import numpy as np
+
+from scoring import FEATURE_COLS, model_features
+
+# "sklearn" scores through the original model objects, "compiled" through the flattened
+# node arrays below. Both give the same probabilities (see check_engine.py).
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "sklearn")
+PARITY_TOLERANCE = 1e-5
+
+
+class CompiledForest:
+    """A tree ensemble flattened into parallel node arrays, scored for a whole batch at once.
+
+    Every tree lives in the same arrays; `roots` holds each tree's first node.
+    Leaves point back at themselves, so walking `max_depth` steps from the
+    roots lands every (row, tree) pair on its leaf without per-row Python.
+    `feature_names_in_` are the columns it was trained on, in split-index order.
+    """
+
+    def __init__(self, left, right, feature, threshold, missing_left, leaf_value, roots, max_depth,
+                 strict, aggregate, base_margin=0.0, feature_names=FEATURE_COLS):
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold)
+        self.missing_left = np.asarray(missing_left, dtype=bool)
+        self.leaf_value = np.asarray(leaf_value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.max_depth = max_depth
+        self.strict = strict  # XGBoost goes left on x < t, sklearn on x <= t
+        self.aggregate = aggregate  # "mean" (forest of probabilities) or "logistic" (boosted margins)
+        self.base_margin = base_margin
+        self.feature_names_in_ = list(feature_names)
+
+    @property
+    def n_nodes(self):
+        return len(self.left)
+
+    def leaves(self, X):
+        """Leaf index of every (row, tree) pair, shape (n_rows, n_trees)."""
+        n = len(X)
+        idx = np.broadcast_to(self.roots, (n, len(self.roots))).copy()
+        rows = np.arange(n)[:, None]
+        for _ in range(self.max_depth):
+            feat = self.feature[idx]
+            leaf = feat < 0
+            if leaf.all():
+                break
+            x = X[rows, np.where(leaf, 0, feat)]
+            thr = self.threshold[idx]
+            go_left = x < thr if self.strict else x <= thr
+            go_left = np.where(np.isnan(x), self.missing_left[idx], go_left)
+            idx = np.where(go_left, self.left[idx], self.right[idx])
+        return idx
+
+    def fraud_probability(self, X):
+        X = self._as_matrix(X)
+        values = self.leaf_value[self.leaves(X)]
+        if self.aggregate == "mean":
+            return values.mean(axis=1)
+        margin = self.base_margin + values.sum(axis=1)
+        return 1.0 / (1.0 + np.exp(-margin))
+
+    # sklearn-style interface, so the scoring code can take either backend
+    def predict_proba(self, X):
+        p = self.fraud_probability(X)
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        return (self.fraud_probability(X) > 0.5).astype(np.int64)
+
+    def _as_matrix(self, X):
+        if hasattr(X, "columns"):
+            X = X[self.feature_names_in_].to_numpy()
+        # Both libraries compare float32 feature values against the split thresholds
+        return np.asarray(X, dtype=np.float64).astype(np.float32)
+
+
+def _compile_sklearn_forest(model):
+    positive = list(model.classes_).index(1)
+    left, right, feature, threshold, missing_left, leaf_value, roots = [], [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+    for est in model.estimators_:
+        t = est.tree_
+        n = t.node_count
+        is_leaf = t.children_left == -1
+        node_ids = np.arange(n) + offset
+        left.append(np.where(is_leaf, node_ids, t.children_left + offset))
+        right.append(np.where(is_leaf, node_ids, t.children_right + offset))
+        feature.append(np.where(is_leaf, -1, t.feature))
+        threshold.append(t.threshold.astype(np.float64))
+        missing = getattr(t, "missing_go_to_left", None)
+        missing_left.append(np.zeros(n, dtype=bool) if missing is None else np.asarray(missing, dtype=bool))
+        # Same normalization as DecisionTreeClassifier.predict_proba
+        counts = t.value[:, 0, :]
+        totals = counts.sum(axis=1)
+        totals[totals == 0] = 1.0
+        leaf_value.append(counts[:, positive] / totals)
+        roots.append(offset)
+        max_depth = max(max_depth, t.max_depth)
+        offset += n
+    return CompiledForest(
+        np.concatenate(left), np.concatenate(right), np.concatenate(feature), np.concatenate(threshold),
+        np.concatenate(missing_left), np.concatenate(leaf_value), roots, max_depth,
+        strict=False, aggregate="mean",
+    )
+
+
+def _compile_xgboost(model):
+    booster = model.get_booster()
+    raw = json.loads(booster.save_raw(raw_format="json"))
+    learner = raw["learner"]
+    if learner["objective"]["name"] != "binary:logistic":
+        raise ValueError(f"Unsupported XGBoost objective: {learner['objective']['name']}")
+    gbm = learner["gradient_booster"]
+    if gbm["name"] != "gbtree":
+        raise ValueError(f"Unsupported XGBoost booster: {gbm['name']}")
+
+    base_score = float(str(learner["learner_model_param"]["base_score"]).strip("[]"))
+    base_margin = float(np.log(base_score / (1.0 - base_score)))
+
+    left, right, feature, threshold, missing_left, leaf_value, roots = [], [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+    for tree in gbm["model"]["trees"]:
+        lc = np.asarray(tree["left_children"])
+        rc = np.asarray(tree["right_children"])
+        n = len(lc)
+        is_leaf = lc == -1
+        node_ids = np.arange(n) + offset
+        cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+        left.append(np.where(is_leaf, node_ids, lc + offset))
+        right.append(np.where(is_leaf, node_ids, rc + offset))
+        feature.append(np.where(is_leaf, -1, np.asarray(tree["split_indices"])))
+        threshold.append(cond)
+        missing_left.append(np.asarray(tree["default_left"], dtype=bool))
+        # For leaves, split_conditions holds the leaf weight
+        leaf_value.append(np.where(is_leaf, cond, 0.0).astype(np.float64))
+        roots.append(offset)
+        max_depth = max(max_depth, _depth(lc, rc))
+        offset += n
+    return CompiledForest(
+        np.concatenate(left), np.concatenate(right), np.concatenate(feature), np.concatenate(threshold),
+        np.concatenate(missing_left), np.concatenate(leaf_value), roots, max_depth,
+        strict=True, aggregate="logistic", base_margin=base_margin,
+    )
+
+
+def _depth(left, right):
+    depth = np.zeros(len(left), dtype=np.int32)
+    for node in range(len(left)):  # XGBoost numbers parents before children
+        if left[node] != -1:
+            depth[left[node]] = depth[node] + 1
+            depth[right[node]] = depth[node] + 1
+    return int(depth.max())
+
+
+def compile_model(model):
+    """Flatten a fitted RandomForestClassifier or XGBClassifier."""
+    if hasattr(model, "get_booster"):
+        forest = _compile_xgboost(model)
+    elif hasattr(model, "estimators_"):
+        forest = _compile_sklearn_forest(model)
+    else:
+        raise TypeError(f"Don't know how to compile {type(model).__name__}")
+    forest.feature_names_in_ = model_features(model)
+    return forest
+
+
+def max_parity_error(model, compiled, X):
+    """Largest |P(fraud)| difference between the reference model and its compiled copy."""
+    import pandas as pd
+    X = pd.DataFrame(np.asarray(X, dtype=np.float64), columns=compiled.feature_names_in_)
+    return float(np.max(np.abs(model.predict_proba(X)[:, 1] - compiled.fraud_probability(X))))
+
+
+def parity_sample(n=2000, seed=0, width=len(FEATURE_COLS)):
+    """Random transactions spanning the ranges the models see (log-uniform amounts and balances).
+
+    Velocity columns get the same treatment; the point is to reach every split, not realism.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.exp(rng.uniform(0, np.log(5e7), size=(n, width)))
+    X[rng.random(X.shape) < 0.2] = 0.0  # lots of zero balances in PaySim
+    return X
+
+
+_ARRAYS = ("left", "right", "feature", "threshold", "missing_left", "leaf_value", "roots")
+
+
+def save_compiled(forest, directory):
+    """Write a compiled forest as plain .npy files (so it can be memory-mapped back)."""
+    os.makedirs(directory, exist_ok=True)
+    for name in _ARRAYS:
+        np.save(os.path.join(directory, f"{name}.npy"), getattr(forest, name))
+    meta = {
+        "max_depth": forest.max_depth,
+        "strict": forest.strict,
+        "aggregate": forest.aggregate,
+        "base_margin": forest.base_margin,
+        "features": forest.feature_names_in_,
+    }
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+
+def load_compiled(directory, mmap_mode="r"):
+    """Load a forest written by save_compiled. With mmap_mode="r", every worker
+    process maps the same page-cache pages instead of holding its own copy."""
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    arrays = [np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in _ARRAYS]
+    forest = CompiledForest.__new__(CompiledForest)
+    for name, array in zip(_ARRAYS, arrays):
+        setattr(forest, name, array)
+    forest.max_depth = meta["max_depth"]
+    forest.strict = meta["strict"]
+    forest.aggregate = meta["aggregate"]
+    forest.base_margin = meta["base_margin"]
+    forest.feature_names_in_ = meta.get("features", FEATURE_COLS)
+    return forest
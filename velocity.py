@@ -0,0 +1,219 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Per-account velocity features, kept incrementally as transactions are scored.
+# Each tracked account owns one row of fixed-size ring buffers (timestamp, amount,
+# counterparty hash); only entries inside the sliding window count. Accounts are
+# capped: when the cap is hit the least recently active account is dropped, and
+# accounts idle for longer than the window are expired as the store goes.
+# Memory is about max_accounts * ring * 20 bytes per store (two stores: senders and
+# receivers). Counts saturate at the ring size.
+# Models trained with TRAIN_VELOCITY=1 score on these columns; the API computes them
+# whenever an active (or shadow) model needs them.
+# The clock is event time, the same online and offline: a "timestamp" (epoch seconds)
+# if the transaction has one, else PaySim's "step" * 1h (what data_prep trains on),
+# else the time it arrived. Stick to one of them per deployment.
+# Limits:
+#   - The store lives in process memory. With several uvicorn workers each one sees
+#     only the requests routed to it, so an account's counts are split across workers
+#     (run one worker, or pin accounts to workers, where the numbers matter).
+#   - Nothing is persisted: a restart starts every window empty.
+VELOCITY_WINDOW_SECONDS = float(os.getenv("VELOCITY_WINDOW_SECONDS", "86400"))
+VELOCITY_RING = int(os.getenv("VELOCITY_RING", "16"))
+VELOCITY_MAX_ACCOUNTS = int(os.getenv("VELOCITY_MAX_ACCOUNTS", "50000"))
+
+# Features describe the history *before* the transaction, so a row never sees itself
+VELOCITY_COLS = [
+    "tx_per_hour",          # sender's transfers per hour over the window
+    "window_outflow",       # sender's total sent inside the window
+    "total_outflow",        # sender's total sent since the store started tracking it
+    "distinct_dests",       # distinct receivers the sender paid inside the window
+    "dest_tx_per_hour",     # receiver's incoming transfers per hour (mule fan-in)
+    "dest_window_inflow",   # receiver's total received inside the window
+    "dest_distinct_origs",  # distinct senders that paid the receiver inside the window
+]
+_EXPIRE_EVERY = 1024
+OBSERVE_SLICE = 256  # rows per lock hold in observe_many
+
+
+def _accounts(column):
+    """Account ids as strings; missing ones (NaN) become None, not one shared "nan" account."""
+    return [None if value is None or value != value else str(value) for value in column.tolist()]
+
+
+def event_time(timestamp=None, step=None, now=None):
+    """Seconds on the velocity clock for one transaction (see the top of this file)."""
+    if timestamp is not None:
+        return float(timestamp)
+    if step is not None:
+        return float(step) * 3600.0
+    return now
+
+
+def event_times(df, now):
+    """event_time for every row of a DataFrame; rows missing the column get `now`.
+
+    "timestamp" may be epoch seconds or anything pandas parses as a date.
+    """
+    import pandas as pd
+    if "timestamp" in df.columns:
+        ts = df["timestamp"]
+        if not pd.api.types.is_numeric_dtype(ts):
+            parsed = pd.to_datetime(ts, utc=True, errors="coerce")
+            ts = (parsed - pd.Timestamp(0, tz="UTC")).dt.total_seconds()
+        times = ts.to_numpy(dtype=np.float64)
+    elif "step" in df.columns:
+        times = pd.to_numeric(df["step"], errors="coerce").to_numpy(dtype=np.float64) * 3600.0
+    else:
+        return np.full(len(df), now, dtype=np.float64)
+    return np.where(np.isnan(times), now, times)
+
+
+class AccountWindows:
+    """Ring buffers for one side of the transaction (senders or receivers)."""
+
+    def __init__(self, max_accounts=VELOCITY_MAX_ACCOUNTS, ring=VELOCITY_RING, window=VELOCITY_WINDOW_SECONDS):
+        self.max_accounts = max_accounts
+        self.ring = ring
+        self.window = window
+        self.ts = np.full((max_accounts, ring), -np.inf)
+        self.amount = np.zeros((max_accounts, ring), dtype=np.float32)
+        self.other = np.zeros((max_accounts, ring), dtype=np.int64)
+        self.head = np.zeros(max_accounts, dtype=np.int32)
+        self.total = np.zeros(max_accounts, dtype=np.float64)
+        self.last_seen = np.full(max_accounts, -np.inf)
+        self._rows = OrderedDict()  # account -> row, least recently active first
+        self._free = list(range(max_accounts - 1, -1, -1))
+        self.evictions = 0
+        self.expirations = 0
+        self._updates = 0
+
+    def _row(self, account, now):
+        row = self._rows.get(account)
+        if row is not None:
+            self._rows.move_to_end(account)
+            return row
+        if self._free:
+            row = self._free.pop()
+        else:
+            _, row = self._rows.popitem(last=False)
+            self.evictions += 1
+        self.ts[row] = -np.inf
+        self.head[row] = 0
+        self.total[row] = 0.0
+        self._rows[account] = row
+        return row
+
+    def observe(self, account, now, amount, other):
+        """(count, window_sum, total, distinct_others) before this transaction, then record it."""
+        row = self._row(account, now)
+        ts = self.ts[row]
+        live = (ts > now - self.window) & (ts <= now)  # nothing from "later" (e.g. a row out of order)
+        count = int(np.count_nonzero(live))
+        features = (
+            count,
+            float(self.amount[row][live].sum()) if count else 0.0,
+            float(self.total[row]),
+            len(set(self.other[row][live].tolist())) if count else 0,
+        )
+        slot = self.head[row]
+        self.ts[row, slot] = now
+        self.amount[row, slot] = amount
+        self.other[row, slot] = other
+        self.head[row] = (slot + 1) % self.ring
+        self.total[row] += amount
+        self.last_seen[row] = now
+
+        self._updates += 1
+        if self._updates % _EXPIRE_EVERY == 0:
+            self.expire(now)
+        return features
+
+    def expire(self, now):
+        """Free the rows of accounts with nothing inside the window any more."""
+        cutoff = now - self.window
+        while self._rows:
+            account, row = next(iter(self._rows.items()))
+            if self.last_seen[row] > cutoff:
+                break
+            del self._rows[account]
+            self._free.append(row)
+            self.expirations += 1
+
+    def stats(self):
+        return {
+            "accounts": len(self._rows),
+            "max_accounts": self.max_accounts,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "bytes": int(sum(a.nbytes for a in (self.ts, self.amount, self.other, self.head, self.total,
+                                                self.last_seen))),
+        }
+
+
+class VelocityStore:
+    """Sender- and receiver-side windows; thread-safe. Usable online and in offline prep."""
+
+    def __init__(self, max_accounts=VELOCITY_MAX_ACCOUNTS, ring=VELOCITY_RING, window=VELOCITY_WINDOW_SECONDS):
+        self.window_hours = window / 3600.0
+        self.origins = AccountWindows(max_accounts, ring, window)
+        self.dests = AccountWindows(max_accounts, ring, window)
+        self._lock = threading.Lock()
+
+    def _observe(self, orig, dest, now, amount):
+        # A missing account on either side just leaves that side's features at zero
+        row = [0.0, 0.0, 0.0, 0.0]
+        if orig is not None:
+            dest_key = hash(dest) if dest is not None else 0
+            count, window_sum, total, distinct = self.origins.observe(orig, now, amount, dest_key)
+            row = [count / self.window_hours, window_sum, total, distinct]
+        if dest is None:
+            return row + [0.0, 0.0, 0.0]
+        d_count, d_sum, _, d_distinct = self.dests.observe(dest, now, amount, hash(orig) if orig is not None else 0)
+        return row + [d_count / self.window_hours, d_sum, d_distinct]
+
+    def observe(self, orig, dest, now, amount):
+        """Velocity features (dict) for one transaction, then add it to the windows."""
+        with self._lock:
+            return dict(zip(VELOCITY_COLS, self._observe(orig, dest, now, amount)))
+
+    def observe_many(self, origs, dests, times, amounts):
+        """(n, len(VELOCITY_COLS)) float32 features for transactions in time order, updating as it goes."""
+        out = np.zeros((len(origs), len(VELOCITY_COLS)), dtype=np.float32)
+        dests = dests if dests is not None else [None] * len(origs)
+        # The lock is taken per slice, not for the whole frame, so a single /predict never
+        # waits behind a big upload for more than one slice (~OBSERVE_SLICE * 30 us)
+        for start in range(0, len(origs), OBSERVE_SLICE):
+            with self._lock:
+                for i in range(start, min(start + OBSERVE_SLICE, len(origs))):
+                    out[i] = self._observe(origs[i], dests[i], float(times[i]), float(amounts[i]))
+        return out
+
+    def observe_frame(self, df, now):
+        """Add VELOCITY_COLS to a DataFrame with an amount column (nameOrig / nameDest optional).
+
+        Rows are taken in event-time order (event_times; rows without one are at `now`),
+        ties in file order. Without account columns the features are zero, as for a new account.
+        """
+        n = len(df)
+        origs = _accounts(df["nameOrig"]) if "nameOrig" in df.columns else [None] * n
+        dests = _accounts(df["nameDest"]) if "nameDest" in df.columns else None
+        times = event_times(df, now)
+        order = np.argsort(times, kind="stable")
+        if np.any(order[1:] < order[:-1]):
+            dests = None if dests is None else [dests[i] for i in order]
+            ordered = self.observe_many([origs[i] for i in order], dests, times[order],
+                                        df["amount"].to_numpy()[order])
+            features = np.empty_like(ordered)
+            features[order] = ordered
+        else:
+            features = self.observe_many(origs, dests, times, df["amount"].to_numpy())
+        for i, col in enumerate(VELOCITY_COLS):
+            df[col] = features[:, i]
+        return df
+
+    def stats(self):
+        return {"window_hours": self.window_hours, "origins": self.origins.stats(), "dests": self.dests.stats()}